@@ -11,13 +11,15 @@ from lib.color import Color  # used for coloring the game menu
 import os  # the os module is used for file and directory operations
 ################################################################################
 
-from game_grid import GameGrid  # the class for modeling the game grid
-from tetromino import Tetromino  # the class for modeling the tetrominoes
-import random  # used for creating tetrominoes with random types (shapes)
+from game_engine import GameEngine  # the class running the game rules
+from renderer import GridRenderer  # used for repainting the changed cells
+from input_handler import InputHandler  # used for queueing the key presses
+from replay import Replay, ReplayPlayer, ReplayRecorder  # used for recording and replaying the games
+import argparse  # used for parsing the command-line arguments
 import time
 
 
-def start(fall_speed=None):
+def start(fall_speed=None, fps=60):
     # set the dimensions of the game grid
     grid_h, grid_w = 20, 12
     # set the size of the drawing canvas (the displayed window)
@@ -28,97 +30,222 @@ def start(fall_speed=None):
     stddraw.setXscale(-0.5, grid_w - 0.5)
     stddraw.setYscale(-0.5, grid_h - 0.5)
 
-    # set the game grid dimension values stored and used in the Tetromino class
-    Tetromino.grid_height = grid_h
-    Tetromino.grid_width = grid_w
-    # create the game grid
-    grid = GameGrid(grid_h, grid_w)
+    # create the game engine (it creates the game grid and the first
+    # tetromino for the given grid dimensions)
+    engine = GameEngine(grid_h, grid_w)
+    grid = engine.grid
+    # when fps is None, the game grid is displayed after each fall tick of
+    # the engine (pausing for 250 ms), otherwise it is rendered fps times per
+    # second independent of the fall speed
+    if fps is None:
+        engine.add_observer(display_game)
+    # the renderer repaints only the cells changed since the last frame
+    renderer = GridRenderer(grid)
     if fall_speed is None:
         fall_speed = display_game_menu(grid_h, grid_w)
-
+    # the actions of the game are recorded to a replay file as it is played
+    recorder = start_recording(engine, fall_speed)
+
+    # the game logic advances in fixed steps of fall_speed ms (tick_time) and
+    # a frame is rendered every frame_time seconds, the loop never waits for
+    # longer than a frame so the keys are handled with the same latency for
+    # all the fall speeds
+    tick_time = fall_speed / 1000
+    frame_time = 1 / fps if fps is not None else None
+    last_fall_time = time.perf_counter()
+    next_frame_time = last_fall_time
+    paused = False
+    # with a frame rate, all the keys pressed since the last iteration of the
+    # loop (and the repeats of the held keys) are handled in each iteration
+    input_handler = InputHandler() if fps is not None else None
+
+    # the main game loop
     while True:
-        last_fall_time = time.time()
-        current_tetromino = create_tetromino()
-        grid.current_tetromino = current_tetromino
-        paused = False
-
-        # create the first tetromino to enter the game grid
-        # by using the create_tetromino function defined below
-        # display a simple menu before opening the game
-        # by using the display_game_menu function defined below
-
-        # the main game loop
-        while True:
-
-            # check for any user interaction via the keyboard
-            if stddraw.hasNextKeyTyped():  # check if the user has pressed a key
-                key_typed = stddraw.nextKeyTyped()  # the most recently pressed key
-                # if the left arrow key has been pressed
-                if key_typed == 'p':
-                    paused = not paused
-
-                if not paused:
-                    if key_typed == "left":
-                        # move the active tetromino left by one
-                        current_tetromino.move(key_typed, grid)
-                    # if the right arrow key has been pressed
-                    elif key_typed == "right":
-                        # move the active tetromino right by one
-                        current_tetromino.move(key_typed, grid)
-                    # if the down arrow key has been pressed
-                    elif key_typed == "down":
-                        # move the active tetromino down by one
-                        # (soft drop: causes the tetromino to fall down faster)
-                        current_tetromino.move(key_typed, grid)
-                    elif key_typed == 'up':  # Assuming 'up' arrow is for rotation
-                        current_tetromino.rotate(grid)
-                    elif key_typed == 's':
-                        while current_tetromino.move("down",
-                                                     grid):  # Move the tetromino down until it can't move further
-                            pass
-
-                # clear the queue of the pressed keys for a smoother interaction
-                stddraw.clearKeysTyped()
-                labels = grid.label_components()
-                grid.move_down_components(labels)
 
+        # check for any user interaction via the keyboard
+        keys_typed = []
+        if input_handler is not None:
+            input_handler.update()
+            while input_handler.has_next_action():
+                keys_typed.append(input_handler.next_action()[1])
+        elif stddraw.hasNextKeyTyped():  # check if the user has pressed a key
+            keys_typed.append(stddraw.nextKeyTyped())  # the most recently pressed key
+            # clear the queue of the pressed keys for a smoother interaction
+            stddraw.clearKeysTyped()
+
+        for key_typed in keys_typed:
+            if key_typed == 'p':
+                paused = not paused
+            # show or hide the landing preview of the current tetromino
+            elif key_typed == 'g':
+                grid.show_ghost = not grid.show_ghost
+
+            if not paused:
+                # move (left, right, down), rotate (up) or hard drop (s) the
+                # active tetromino and let the floating tiles fall
+                engine.apply_action(key_typed)
+
+        current_time = time.perf_counter()
+        if not paused:
+            # run the fall ticks that are due (at most max_catch_up ticks
+            # at once, e.g. after the window was not responding for a while)
+            due_ticks = int((current_time - last_fall_time) / tick_time)
+            if due_ticks > max_catch_up:
+                last_fall_time = current_time - max_catch_up * tick_time
+                due_ticks = max_catch_up
+            for _ in range(due_ticks):
+                engine.tick()
+                last_fall_time += tick_time
+
+                if grid.game_over:
+                    recorder.close()
+                    stddraw.clear()  # Clear the canvas
+
+                    stddraw.setPenColor(stddraw.VIOLET)
+                    stddraw.filledRectangle(0, 0, grid_w, grid_h)
+
+                    stddraw.setFontSize(40)
+                    stddraw.setPenColor(stddraw.BLACK)
+                    stddraw.text(grid_w / 2, grid_h / 2, "Game Over")
+                    fall_speed = display_restart_button(grid_h, grid_w)  # Capture fall speed from restart
+
+                    stddraw.show()
+
+                    return fall_speed  # end the game loop
+
+                if grid.check_win():
+                    # the recording ends when the game is won, the restart
+                    # button of the game won screen starts a new game
+                    recorder.close()
+                    grid.draw_game_won()
+                    show_ghost = grid.show_ghost
+                    engine.reset()
+                    grid = engine.grid
+                    grid.show_ghost = show_ghost
+                    renderer = GridRenderer(grid)
+                    if input_handler is not None:
+                        # drop the keys pressed (or held) on the game won
+                        # screen so they are not applied to the new game
+                        input_handler.clear()
+                        stddraw.enableKeyEvents()
+                    else:
+                        stddraw.clearKeysTyped()
+                    recorder = start_recording(engine, fall_speed)
+                    # the game continues after the game won screen
+                    last_fall_time = time.perf_counter()
+        else:
+            # the fall ticks do not accumulate while the game is paused
+            last_fall_time = current_time
+            if frame_time is None:
+                # Display a pause screen or simply do nothing
+                draw_pause_message(grid_h, grid_w)
+                stddraw.show(100)  # Update the display to show the paused message
+
+        if frame_time is not None:
+            # render a frame when it is due (skipping the missed frames)
+            if current_time >= next_frame_time:
+                if paused:
+                    grid.display(pause=None)
+                    draw_pause_message(grid_h, grid_w)
+                    stddraw.show(0)
+                    # the pause message is removed by the next frame
+                    renderer.invalidate()
+                else:
+                    renderer.render()
+                next_frame_time = max(next_frame_time + frame_time, current_time)
+            # wait until the next frame or the next fall tick is due
+            wait_time = next_frame_time - time.perf_counter()
             if not paused:
+                wait_time = min(wait_time, last_fall_time + tick_time - time.perf_counter())
+            if wait_time > 0:
+                time.sleep(min(wait_time, frame_time))
+
+
+# the maximum number of fall ticks run at once to catch up with the clock
+max_catch_up = 5
+# the directory of the replay files (next to this file)
+replay_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "replays")
 
-                current_time = time.time()
-                if (current_time - last_fall_time) * 1000 >= fall_speed:
-                    success = current_tetromino.move("down", grid)
-                    grid.merge_tiles()
-                    last_fall_time = current_time
 
-                    if not success:
-                        tiles, pos = current_tetromino.get_min_bounded_tile_matrix(True)
-                        game_over = grid.update_grid(tiles, pos)
-                        if game_over:
-                            stddraw.clear()  # Clear the canvas
+# A function that starts recording the game of the engine to a new replay file
+# named after the current time and the seed of the game
+def start_recording(engine, fall_speed):
+    os.makedirs(replay_dir, exist_ok=True)
+    file_name = "%s-%d.t2r" % (time.strftime("%Y%m%d-%H%M%S"), engine.seed)
+    return ReplayRecorder.open(os.path.join(replay_dir, file_name), engine, fall_speed)
 
-                            stddraw.setPenColor(stddraw.VIOLET)
-                            stddraw.filledRectangle(0, 0, grid_w, grid_h)
 
-                            stddraw.setFontSize(40)
-                            stddraw.setPenColor(stddraw.BLACK)
-                            stddraw.text(grid_w / 2, grid_h / 2, "Game Over")
-                            fall_speed = display_restart_button(grid_h, grid_w)  # Capture fall speed from restart
+# A function for playing back a replay file: the recorded actions are applied
+# to a new game engine created with the recorded seed and settings, so the game
+# is reproduced exactly, and the game grid is rendered at the recorded fall
+# speed (or the given one in ms), 'p' pauses the playback
+def start_replay(replay_file, fall_speed=None, fps=60):
+    replay = Replay.load(replay_file)
+    grid_h, grid_w = replay.grid_height, replay.grid_width
+    stddraw.setCanvasSize(40 * grid_w, 40 * grid_h)
+    stddraw.setXscale(-0.5, grid_w - 0.5)
+    stddraw.setYscale(-0.5, grid_h - 0.5)
 
-                            stddraw.show()
+    player = ReplayPlayer(replay)
+    grid = player.engine.grid
+    renderer = GridRenderer(grid)
+    if fall_speed is None:
+        fall_speed = replay.fall_speed or 250
+    # the fall ticks and the frames are timed as in start()
+    tick_time, frame_time = fall_speed / 1000, 1 / fps
+    last_fall_time = time.perf_counter()
+    next_frame_time = last_fall_time
+    paused = False
+    while not player.done:
+        stddraw.pollEvents()
+        while stddraw.hasNextKeyTyped():
+            if stddraw.nextKeyTyped() == 'p':
+                paused = not paused
+        current_time = time.perf_counter()
+        if paused:
+            last_fall_time = current_time
+        else:
+            due_ticks = min(int((current_time - last_fall_time) / tick_time), max_catch_up)
+            for _ in range(due_ticks):
+                player.advance()
+                last_fall_time += tick_time
+            last_fall_time = max(last_fall_time, current_time - tick_time)
+        # render a frame when it is due (only the changed cells are repainted)
+        if current_time >= next_frame_time:
+            renderer.render(pause=0)
+            next_frame_time = max(next_frame_time + frame_time, current_time)
+        # wait until the next frame or the next fall tick is due
+        wait_time = next_frame_time - time.perf_counter()
+        if not paused:
+            wait_time = min(wait_time, last_fall_time + tick_time - time.perf_counter())
+        if wait_time > 0:
+            time.sleep(min(wait_time, frame_time))
+
+    grid.display(pause=None)
+    stddraw.setFontSize(30)
+    stddraw.setPenColor(stddraw.YELLOW)
+    stddraw.text((grid_w - 1) / 2, (grid_h - 1) / 2, "Replay Over")
+    stddraw.show(0)
+    if replay.final_score is not None and player.engine.score != replay.final_score:
+        print("The replayed score %d differs from the recorded score %d."
+              % (player.engine.score, replay.final_score))
+    else:
+        print("Replay over, score %d after %d ticks." % (player.engine.score, player.engine.ticks))
+    # wait for a key press before closing the window
+    while not stddraw.hasNextKeyTyped():
+        stddraw.show(50)
 
-                            return fall_speed  # end the game loop
 
-                        current_tetromino = create_tetromino()
-                        grid.current_tetromino = current_tetromino
+def draw_pause_message(grid_h, grid_w):
+    stddraw.setFontSize(40)
+    stddraw.setPenColor(stddraw.YELLOW)
+    stddraw.text((grid_w - 1) / 2, (grid_h - 1) / 2, "Game Paused")
 
-                    grid.display()
 
-                    if grid.check_win():
-                        grid.draw_game_won()
-            else:
-                # Display a pause screen or simply do nothing
-                stddraw.text(canvas_w / 2, canvas_h / 2, "Game Paused")
-                stddraw.show(100)  # Update the display to show the paused message
+# observer of the game engine for displaying the game grid after a fall tick
+def display_game(engine):
+    if not engine.grid.game_over:
+        engine.grid.display()
 
 
 def display_restart_button(grid_h, grid_w):
@@ -144,16 +271,6 @@ def display_restart_button(grid_h, grid_w):
                 return display_game_menu(grid_h, grid_w)
 
 
-def create_tetromino():
-    # the type (shape) of the tetromino is determined randomly
-    tetromino_types = ['I', '.', 'O', 'Z', 'S', 'L', 'J', 'T']
-    random_index = random.randint(0, len(tetromino_types) - 1)
-    random_type = tetromino_types[random_index]
-    # create and return the tetromino
-    tetromino = Tetromino(random_type)
-    return tetromino
-
-
 def display_game_menu(grid_height, grid_width):
     # Define colors used for the menu
     background_color = Color(72, 19, 59)
@@ -218,6 +335,14 @@ def display_game_menu(grid_height, grid_width):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play Tetris 2048.")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="play back a replay file (the games are recorded in replays/)")
+    parser.add_argument("--fall-speed", type=int, help="fall speed of the playback in ms")
+    args = parser.parse_args()
+    if args.replay is not None:
+        start_replay(args.replay, args.fall_speed)
+        raise SystemExit
     fall_speed = None  # Initialize with None or a default value
     while True:
         fall_speed = start(fall_speed)  # Pass the current fall_speed to start
@@ -0,0 +1,253 @@
+import numpy as np
+
+from board import clear_full_rows, merge_columns, drop_floating_cells
+from game_engine import GameEngine  # used for the tetromino types of the game
+from tetromino import Tetromino  # used for the shapes of the tetrominoes
+
+
+# A function that builds the arrays used for moving the tetrominoes of a batch
+# from the tables of the Tetromino class: the size n of the tile matrix of each
+# type, the (dx, dy) offsets of the four tiles from the bottom left cell for
+# each of the four rotation states (the monomino repeats its only tile) and the
+# five SRS wall kicks tried for a clockwise rotation from each rotation state
+def build_piece_tables(tetromino_types):
+    n_types = len(tetromino_types)
+    sizes = np.zeros(n_types, dtype=np.int64)
+    offsets = np.zeros((n_types, 4, 4, 2), dtype=np.int64)
+    kicks = np.zeros((n_types, 4, 5, 2), dtype=np.int64)
+    for t, shape in enumerate(tetromino_types):
+        sizes[t] = Tetromino.shapes[shape][0]
+        for rotation, tile_offsets in enumerate(Tetromino.rotation_offsets[shape]):
+            offsets[t, rotation] = [tile_offsets[i % len(tile_offsets)] for i in range(4)]
+            kicks[t, rotation] = Tetromino.get_wall_kicks(shape, rotation)
+    return sizes, offsets, kicks
+
+
+# A class that simulates N games of Tetris 2048 at once. The locked tiles of all
+# the games are stored as the exponents of their numbers in one (N, h, w) uint8
+# array (0 = empty cell) and the current tetrominoes in per-board arrays, so
+# each step applies one action per board with vectorized NumPy operations that
+# follow the rules of GameEngine (and the board kernels used by GameGrid).
+class BatchGameGrid:
+    # the actions are given as codes, the index of the key name in this tuple
+    # (0 = no key press, then "left", "right", "down", "up" (rotate), "s" (drop))
+    actions = (None,) + GameEngine.actions
+    tetromino_types = GameEngine.tetromino_types
+    sizes, offsets, kicks = build_piece_tables(tetromino_types)
+
+    def __init__(self, n_boards, grid_h=20, grid_w=12, seed=None, stop_on_win=False,
+                 wall_kicks=False):
+        self.n_boards = n_boards
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.stop_on_win = stop_on_win
+        # when wall_kicks is True, the rotations use the SRS wall kicks
+        self.wall_kicks = wall_kicks
+        # the random number generator used for creating the tetrominoes
+        self.rng = np.random.default_rng(seed)
+        self.cells = np.zeros((n_boards, grid_h, grid_w), dtype=np.uint8)
+        self.score = np.zeros(n_boards, dtype=np.int64)
+        self.doubled = np.zeros(n_boards, dtype=bool)
+        self.quadrupled = np.zeros(n_boards, dtype=bool)
+        self.game_over = np.zeros(n_boards, dtype=bool)
+        self.game_won = np.zeros(n_boards, dtype=bool)
+        self.ticks = np.zeros(n_boards, dtype=np.int64)
+        # the current tetromino of each board: the index of its type, rotation
+        # state, bottom left cell and the exponents of its tiles
+        self.piece_type = np.zeros(n_boards, dtype=np.int64)
+        self.rotation = np.zeros(n_boards, dtype=np.int64)
+        self.x = np.zeros(n_boards, dtype=np.int64)
+        self.y = np.zeros(n_boards, dtype=np.int64)
+        self.piece_exponents = np.zeros((n_boards, 4), dtype=np.uint8)
+        self.reset()
+
+    # the games that are over (or won if stop_on_win is set)
+    @property
+    def done(self):
+        return self.game_over | (self.stop_on_win & self.game_won)
+
+    # A method for starting new games on the given boards (a boolean mask or
+    # an array of indexes, all the boards by default)
+    def reset(self, boards=None):
+        index = self._index(boards)
+        self.cells[index] = 0
+        for values in (self.score, self.ticks):
+            values[index] = 0
+        for flags in (self.doubled, self.quadrupled, self.game_over, self.game_won):
+            flags[index] = False
+        self.spawn(index)
+
+    # A method for creating new tetrominoes on the given boards
+    def spawn(self, boards=None):
+        index = self._index(boards)
+        count = len(index)
+        types = self.rng.integers(0, len(self.tetromino_types), count)
+        # each tile gets the number 2 or 4 (the exponent 1 or 2)
+        exponents = self.rng.integers(1, 3, (count, 4)).astype(np.uint8)
+        # the monomino repeats its only tile in the tile arrays
+        single = self.sizes[types] == 1
+        exponents[single, 1:] = exponents[single, :1]
+        self.piece_type[index] = types
+        self.rotation[index] = 0
+        self.piece_exponents[index] = exponents
+        # a random horizontal position above the game grid
+        self.x[index] = self.rng.integers(0, self.grid_width - self.sizes[types] + 1)
+        self.y[index] = self.grid_height - 1
+
+    # A method that applies one action code per board (an array of N codes
+    # or one code for all the boards) and advances all the games that are not
+    # done by one fall tick, returning the score deltas and the done flags
+    def step(self, actions):
+        actions = np.broadcast_to(np.asarray(actions), (self.n_boards,))
+        active = ~self.done
+        score = self.score.copy()
+        # move the tetrominoes left, right or down
+        for code, dx, dy in ((1, -1, 0), (2, 1, 0), (3, 0, -1)):
+            pressed = active & (actions == code)
+            if pressed.any():
+                moved = pressed & self._fits(self.x + dx, self.y + dy, self.rotation)
+                self.x += dx * moved
+                self.y += dy * moved
+        # rotate the tetrominoes (except the O tetrominoes) clockwise
+        pressed = active & (actions == 4) & (self.piece_type != self.tetromino_types.index('O'))
+        if pressed.any():
+            self._rotate(pressed)
+        # hard drop the tetrominoes
+        pressed = active & (actions == 5)
+        if pressed.any():
+            self.y -= self._drop_distance(pressed)
+        # let the floating tile groups fall on the boards with a key press
+        pressed = active & (actions != 0)
+        if pressed.any():
+            self._apply(drop_floating_cells, pressed)
+        self.tick(active)
+        return self.score - score, self.done
+
+    # A method for advancing the games on the given boards (the games that are
+    # not done by default) by one fall tick as in GameEngine.tick
+    def tick(self, active=None):
+        if active is None:
+            active = ~self.done
+        active = active & ~self.game_over
+        if not active.any():
+            return
+        self.ticks += active
+        can_fall = self._fits(self.x, self.y - 1, self.rotation)
+        self.y -= active & can_fall
+        # merge the tiles on the boards and add the merged numbers to the score
+        index = np.flatnonzero(active)
+        cells = self.cells[index]
+        points, merged = merge_columns(cells)
+        self.cells[index] = cells
+        self._add_points(index, points, merged)
+        self.game_won[index] |= (self.cells[index] == 11).any(axis=(1, 2))
+        # lock the tetrominoes that cannot move down any further
+        locking = active & ~can_fall
+        if locking.any():
+            self._lock(np.flatnonzero(locking))
+
+    # A method that returns the positions (xs, ys) of the tiles of the current
+    # tetrominoes as (N, 4) arrays for the given bottom left cells and rotations
+    def piece_cells(self, x=None, y=None, rotation=None):
+        x = self.x if x is None else x
+        y = self.y if y is None else y
+        rotation = self.rotation if rotation is None else rotation
+        offsets = self.offsets[self.piece_type, rotation]
+        return x[:, None] + offsets[..., 0], y[:, None] + offsets[..., 1]
+
+    # A method that returns which tetrominoes fit on their boards for the given
+    # positions, tiles above the game grid are allowed as in Tetromino.can_be_moved
+    def _fits(self, x, y, rotation):
+        xs, ys = self.piece_cells(x, y, rotation)
+        return self._cells_free(xs, ys)
+
+    # A method that rotates the tetrominoes of the given boards clockwise when
+    # the rotated tetromino fits (in place or after one of the wall kicks)
+    def _rotate(self, boards):
+        new_rotation = (self.rotation + 1) % 4
+        kicks = self.kicks[self.piece_type, self.rotation]
+        pending = boards.copy()
+        for k in range(kicks.shape[1] if self.wall_kicks else 1):
+            kick_x, kick_y = kicks[:, k, 0], kicks[:, k, 1]
+            fits = pending & self._fits(self.x + kick_x, self.y + kick_y, new_rotation)
+            self.x += kick_x * fits
+            self.y += kick_y * fits
+            self.rotation[fits] = new_rotation[fits]
+            pending &= ~fits
+            if not pending.any():
+                break
+
+    def _cells_free(self, xs, ys):
+        inside = (xs >= 0) & (xs < self.grid_width) & (ys >= 0)
+        boards = np.arange(self.n_boards)[:, None]
+        rows = np.clip(ys, 0, self.grid_height - 1)
+        cols = np.clip(xs, 0, self.grid_width - 1)
+        empty = (ys >= self.grid_height) | (self.cells[boards, rows, cols] == 0)
+        return (inside & empty).all(axis=1)
+
+    # A method that returns how many rows each tetromino on the given boards can
+    # move down (0 for the other boards)
+    def _drop_distance(self, boards):
+        distance = np.zeros(self.n_boards, dtype=np.int64)
+        falling = boards.copy()
+        while falling.any():
+            falling &= self._fits(self.x, self.y - distance - 1, self.rotation)
+            distance += falling
+        return distance
+
+    # A method that applies a board kernel in place to the boards in the mask
+    def _apply(self, kernel, boards):
+        index = np.flatnonzero(boards)
+        cells = self.cells[index]
+        result = kernel(cells)
+        self.cells[index] = cells
+        return result
+
+    # A method that adds the merged numbers to the scores of the given boards.
+    # The boards where a doubling threshold of GameGrid.update_score is reached
+    # add the numbers one by one as in GameGrid.add_tile_points.
+    def _add_points(self, index, points, merged):
+        new_score = self.score[index] + points
+        doubled, quadrupled = self.doubled[index], self.quadrupled[index]
+        threshold = (points > 0) & ((~doubled & (new_score >= 200)) |
+                                    (doubled & ~quadrupled & (new_score >= 16000)))
+        self.score[index] = np.where(threshold, self.score[index], new_score)
+        for i in np.flatnonzero(threshold):
+            board = index[i]
+            exponents = self.cells[board].T[merged[i].T]
+            doublings = 0
+            for exponent in exponents:
+                self.score[board] += 1 << (int(exponent) + doublings)
+                if self.score[board] >= 200 and not self.doubled[board]:
+                    self.doubled[board] = True
+                elif self.score[board] >= 16000 and not self.quadrupled[board]:
+                    self.quadrupled[board] = True
+                else:
+                    continue
+                # double the tile values on the board
+                doublings += 1
+                cells = self.cells[board]
+                cells[cells > 0] += 1
+
+    # A method that locks the current tetrominoes of the given boards on the
+    # boards, clears the full rows and creates new tetrominoes (the game is
+    # over on the boards where a locked tile is above the game grid)
+    def _lock(self, index):
+        xs, ys = self.piece_cells()
+        xs, ys = xs[index], ys[index]
+        inside = ys < self.grid_height
+        boards = np.broadcast_to(index[:, None], xs.shape)
+        self.cells[boards[inside], ys[inside], xs[inside]] = self.piece_exponents[index][inside]
+        self.game_over[index] |= ~inside.all(axis=1)
+        cells = self.cells[index]
+        self.score[index] += 100 * clear_full_rows(cells)
+        self.cells[index] = cells
+        self.spawn(index[~self.game_over[index]])
+
+    def _index(self, boards):
+        if boards is None:
+            return np.arange(self.n_boards)
+        boards = np.asarray(boards)
+        if boards.dtype == bool:
+            return np.flatnonzero(boards)
+        return boards
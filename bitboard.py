@@ -0,0 +1,87 @@
+import numpy as np
+
+
+# the widest rows stored as int64 values (one bit is left free, so the rows can
+# be shifted by one column without overflowing, see board.supported_cells)
+max_int64_width = 62
+
+
+# A function that returns the occupancy of each row of a board (or of each
+# board in a stack) as an integer whose bit c is set when column c is occupied.
+# The integers are int64 values for the grids up to max_int64_width columns
+# and Python ints (in an object array) for the wider grids.
+def row_bits(cells):
+    occupied = cells > 0
+    if cells.shape[-1] <= max_int64_width:
+        weights = np.left_shift(1, np.arange(cells.shape[-1], dtype=np.int64))
+        return occupied.astype(np.int64) @ weights
+    weights = np.array([1 << col for col in range(cells.shape[-1])], dtype=object)
+    return occupied.astype(object) @ weights
+
+
+# A function that builds the row masks of each shape for each rotation state
+# from the (dx, dy) tile offsets of the Tetromino rotation tables. The masks of
+# a rotation are stored as (min_dx, max_dx, ((dy, mask), ...)) where bit i of
+# mask is set when the tile at dx = min_dx + i is in the row dy of the shape.
+def build_row_masks(rotation_offsets):
+    row_masks = {}
+    for shape, rotations in rotation_offsets.items():
+        masks = []
+        for offsets in rotations:
+            min_dx = min(dx for dx, dy in offsets)
+            max_dx = max(dx for dx, dy in offsets)
+            rows = {}
+            for dx, dy in offsets:
+                rows[dy] = rows.get(dy, 0) | 1 << (dx - min_dx)
+            masks.append((min_dx, max_dx, tuple(sorted(rows.items()))))
+        row_masks[shape] = tuple(masks)
+    return row_masks
+
+
+# A class for modeling the occupancy of a game grid as one integer per row
+# (bit c of rows[r] is set when the cell in row r and column c is occupied),
+# so that checking if a tetromino fits costs a few shift and AND operations
+class BitBoard:
+    def __init__(self, grid_h, grid_w):
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.rows = [0] * grid_h
+
+    # A method that returns a bitboard with the occupancy of the given cells
+    # (an exponent or a boolean matrix)
+    @classmethod
+    def from_cells(cls, cells):
+        bitboard = cls(*np.shape(cells))
+        bitboard.update(cells)
+        return bitboard
+
+    # A method for setting all the rows from the given cells
+    def update(self, cells):
+        self.rows = row_bits(np.asarray(cells)).tolist()
+
+    def set(self, row, col):
+        self.rows[row] |= 1 << col
+
+    def unset(self, row, col):
+        self.rows[row] &= ~(1 << col)
+
+    def is_occupied(self, row, col):
+        return 0 <= row < self.grid_height and 0 <= col < self.grid_width \
+            and self.rows[row] >> col & 1 == 1
+
+    # A method that returns whether a tetromino with the given row masks (see
+    # build_row_masks) fits for the given bottom left cell: inside the side
+    # walls, above the floor and not on the occupied cells (the rows above the
+    # grid are empty)
+    def fits(self, masks, x, y):
+        min_dx, max_dx, rows = masks
+        if x + min_dx < 0 or x + max_dx >= self.grid_width:
+            return False
+        shift = x + min_dx
+        for dy, mask in rows:
+            row = y + dy
+            if row < 0:
+                return False
+            if row < self.grid_height and self.rows[row] & mask << shift:
+                return False
+        return True
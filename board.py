@@ -0,0 +1,392 @@
+import numpy as np
+
+from tile import Tile  # used for creating tiles on demand (e.g. for drawing)
+from components import ComponentIndex  # used for tracking the tile groups
+from bitboard import BitBoard, row_bits  # used for the row occupancy bits
+
+
+# A function that returns the exponent of a tile number (2 ** exponent = number)
+def number_to_exponent(number):
+    return int(number).bit_length() - 1
+
+
+# A function that returns the tile number for an exponent (0 for an empty cell)
+def exponent_to_number(exponent):
+    return 1 << int(exponent) if exponent else 0
+
+
+# A function that removes the full rows of a board (an exponent matrix with
+# shape (h, w)) or of each board in a stack of boards (shape (n, h, w)) in place
+# and moves the rows above them down, returning the number of removed rows
+# (an integer array with one value per board for a stack of boards)
+def clear_full_rows(cells):
+    full = (cells > 0).all(axis=-1)
+    rows_cleared = full.sum(axis=-1)
+    if not full.any():
+        return rows_cleared
+    # a stable sort of the rows by fullness keeps the order of the remaining
+    # rows and puts the full rows to the top where they are emptied
+    order = np.argsort(full, axis=-1, kind="stable")
+    cells[...] = np.take_along_axis(cells, order[..., None], axis=-2)
+    grid_h = cells.shape[-2]
+    cells[np.arange(grid_h) >= grid_h - rows_cleared[..., None]] = 0
+    return rows_cleared
+
+
+# A function that merges the vertically adjacent tiles with the same number in
+# each column of a board (shape (h, w)) or of a stack of boards (shape (n, h, w))
+# in place. As in the column scan of GameGrid.merge_tiles, the pairs are formed
+# from the bottom to the top of each run of equal tiles (a merged tile is not
+# merged again in the same pass) and the tiles above a merged pair move down by
+# one. Returns the score delta (the sum of the merged numbers, per board for a
+# stack of boards) and a boolean array marking the merged tiles on the board.
+def merge_columns(cells):
+    same = (cells[..., :-1, :] > 0) & (cells[..., :-1, :] == cells[..., 1:, :])
+    merged = np.zeros(cells.shape, dtype=bool)
+    if not same.any():
+        return np.zeros(cells.shape[:-2], dtype=np.int64), merged
+    if cells.ndim == 3:
+        # only the boards with equal adjacent tiles are processed
+        boards = np.flatnonzero(same.any(axis=(1, 2)))
+        if len(boards) < len(cells):
+            points = np.zeros(len(cells), dtype=np.int64)
+            subset = cells[boards]
+            points[boards], merged[boards] = merge_columns(subset)
+            cells[boards] = subset
+            return points, merged
+    grid_h = cells.shape[-2]
+    rows = np.arange(grid_h, dtype=np.int16)[:, None]
+    # the position of each tile in its run of equal tiles in the column
+    continues = np.zeros(cells.shape, dtype=bool)
+    continues[..., 1:, :] = same
+    run_start = np.maximum.accumulate(np.where(continues, 0, rows), axis=-2)
+    even = (rows - run_start) % 2 == 0
+    # a tile at an even position merges with the equal tile right above it
+    bottom = np.zeros(cells.shape, dtype=bool)
+    bottom[..., :-1, :] = same & even[..., :-1, :]
+    top = np.zeros(cells.shape, dtype=bool)
+    top[..., 1:, :] = bottom[..., :-1, :]
+    cells[bottom] += 1
+    # remove the top tiles of the merged pairs by a stable sort of each column
+    order = np.argsort(top, axis=-2, kind="stable")
+    cells[...] = np.take_along_axis(cells, order, axis=-2)
+    merged[...] = np.take_along_axis(bottom, order, axis=-2)
+    cells[rows >= grid_h - top.sum(axis=-2)[..., None, :]] = 0
+    points = np.where(merged, np.left_shift(1, cells, dtype=np.int64), 0)
+    return points.sum(axis=(-2, -1)), merged
+
+
+# A function that labels the groups of 4-connected cells of an occupancy matrix
+# (shape (h, w)) or of a stack of occupancy matrices (shape (n, h, w)) at once.
+# Each group is labelled by 1 + the flat index of its first cell (row by row)
+# and the empty cells by 0. The labels are spread by taking the minimum over
+# the neighbours and jumping to the label of the labelled cell until stable.
+def label_cells(occupied):
+    occupied = np.asarray(occupied, dtype=bool)
+    grid_h, grid_w = occupied.shape[-2:]
+    first = np.arange(1, grid_h * grid_w + 1).reshape(grid_h, grid_w)
+    labels = np.where(occupied, first, 0)
+    empty = grid_h * grid_w + 1  # larger than any label
+    while True:
+        current = np.where(occupied, labels, empty)
+        smallest = current.copy()
+        np.minimum(smallest[..., 1:, :], current[..., :-1, :], out=smallest[..., 1:, :])
+        np.minimum(smallest[..., :-1, :], current[..., 1:, :], out=smallest[..., :-1, :])
+        np.minimum(smallest[..., :, 1:], current[..., :, :-1], out=smallest[..., :, 1:])
+        np.minimum(smallest[..., :, :-1], current[..., :, 1:], out=smallest[..., :, :-1])
+        smallest = np.where(occupied, smallest, 0)
+        # pointer jumping: take the label of the cell that the label refers to
+        flat = smallest.reshape(smallest.shape[:-2] + (-1,))
+        jumped = np.take_along_axis(flat, np.maximum(flat - 1, 0), axis=-1)
+        new_labels = np.where(occupied, jumped.reshape(smallest.shape), 0)
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+# A function that returns a boolean array marking the tiles of a board (or of
+# each board in a stack) that are connected to the bottom row through tiles.
+# The support is spread with bit operations on the row occupancy integers.
+def supported_cells(cells):
+    occupied = row_bits(cells)
+    supported = np.zeros_like(occupied)
+    supported[..., 0] = occupied[..., 0]
+    while True:
+        grown = supported | (supported << 1) | (supported >> 1)
+        grown[..., 1:] |= supported[..., :-1]
+        grown[..., :-1] |= supported[..., 1:]
+        grown &= occupied
+        if np.array_equal(grown, supported):
+            break
+        supported = grown
+    columns = np.arange(cells.shape[-1], dtype=np.int64)
+    return (supported[..., None] >> columns) & 1 == 1
+
+
+# A function that moves the groups of tiles not connected to the bottom row of
+# a board (or of each board in a stack) down in place. By default all these
+# groups move down by one row (as by GameGrid.move_down_components), when
+# settle is True they keep falling until every tile rests on the bottom row or
+# on other tiles. Returns a boolean (per board for a stack) showing whether any
+# tile was moved.
+def drop_floating_cells(cells, settle=False):
+    moved = np.zeros(cells.shape[:-2], dtype=bool)
+    while True:
+        floating = (cells > 0) & ~supported_cells(cells)
+        falling = floating.any(axis=(-2, -1))
+        if not falling.any():
+            return moved
+        moved |= falling
+        # the cells below the floating tiles are empty or floating as well, so
+        # all the floating tiles can be moved down by one row at once
+        exponents = np.where(floating, cells, 0)
+        cells[floating] = 0
+        cells[..., :-1, :] |= exponents[..., 1:, :]
+        if not settle:
+            return moved
+
+
+# A class for modeling the locked tiles of a game grid in a compact form: the
+# exponent of each tile (2 ** exponent is the number on the tile) is stored in
+# a uint8 matrix where 0 stands for an empty cell. Row 0 is the bottom row as
+# in the tile matrix of the game grid. Tile objects are only created on demand.
+# The board also keeps the height of each column, the number of tiles in each
+# row and the occupancy bits of the rows up to date, so the cells must be
+# changed by the methods of the board (or update_indexes must be called after
+# changing them directly).
+class Board:
+    def __init__(self, grid_h, grid_w):
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        # the exponents of the locked tiles (0 = empty cell)
+        self.cells = np.zeros((grid_h, grid_w), dtype=np.uint8)
+        # the groups of 4-connected tiles, updated from the cells when needed
+        self.components = ComponentIndex(grid_h, grid_w)
+        # the number of rows up to the top-most tile of each column (0 for an
+        # empty column) and the number of tiles in each row
+        self._column_heights = np.zeros(grid_w, dtype=np.int64)
+        self._row_fill_counts = np.zeros(grid_h, dtype=np.int64)
+        # the occupancy of the rows as integers (used for collision checks)
+        self.bitboard = BitBoard(grid_h, grid_w)
+
+    # A method that returns a board with a copy of the given exponent matrix
+    @classmethod
+    def from_exponents(cls, exponents):
+        board = cls(*np.shape(exponents))
+        board.cells[:] = exponents
+        board.update_indexes()
+        return board
+
+    # A method that returns a board with the numbers of the tiles in the given
+    # tile matrix (a numpy object array with None for the empty cells)
+    @classmethod
+    def from_tile_matrix(cls, tile_matrix):
+        board = cls(*np.shape(tile_matrix))
+        for (row, col), tile in np.ndenumerate(tile_matrix):
+            if tile is not None:
+                board.cells[row, col] = number_to_exponent(tile.number)
+        board.update_indexes()
+        return board
+
+    def copy(self):
+        return Board.from_exponents(self.cells)
+
+    # A method that returns the state of the board as read-only copies of the
+    # cells and the indexes (the copies can be shared by any number of
+    # restores as they are never changed)
+    def snapshot(self):
+        arrays = (self.cells.copy(), self._column_heights.copy(), self._row_fill_counts.copy())
+        for array in arrays:
+            array.flags.writeable = False
+        return arrays + (tuple(self.bitboard.rows),)
+
+    # A method for restoring a state returned by snapshot (the indexes are
+    # copied instead of being computed again from the cells, and the component
+    # index is updated from the cells when it is used next)
+    def restore(self, state):
+        cells, column_heights, row_fill_counts, rows = state
+        self.cells[:] = cells
+        self._column_heights[:] = column_heights
+        self._row_fill_counts[:] = row_fill_counts
+        self.bitboard.rows = list(rows)
+
+    # A method for removing all the tiles on the board
+    def clear(self):
+        self.cells.fill(0)
+        self.update_indexes()
+
+    # A method for computing the column heights and the row fill counts again
+    # from the cells (e.g. after the cells are changed directly)
+    def update_indexes(self):
+        occupied = self.cells > 0
+        self._row_fill_counts[:] = occupied.sum(axis=1)
+        top = self.grid_height - np.argmax(occupied[::-1], axis=0)
+        self._column_heights[:] = np.where(occupied.any(axis=0), top, 0)
+        self.bitboard.update(occupied)
+
+    # the height of each column: the number of rows up to its top-most tile
+    # (a read-only view that stays up to date)
+    @property
+    def column_heights(self):
+        view = self._column_heights.view()
+        view.flags.writeable = False
+        return view
+
+    # the number of tiles in each row (a read-only view that stays up to date)
+    @property
+    def row_fill_counts(self):
+        view = self._row_fill_counts.view()
+        view.flags.writeable = False
+        return view
+
+    # A method that returns the indexes of the full rows from the bottom up
+    def full_rows(self):
+        return np.flatnonzero(self._row_fill_counts == self.grid_width)
+
+    def is_inside(self, row, col):
+        return 0 <= row < self.grid_height and 0 <= col < self.grid_width
+
+    # the cells outside the board are not occupied
+    def is_occupied(self, row, col):
+        return self.is_inside(row, col) and self.cells[row, col] != 0
+
+    # A method that returns the number on the tile in the given cell (0 if empty)
+    def get_number(self, row, col):
+        return exponent_to_number(self.cells[row, col])
+
+    # A method that puts a tile with the given number (None or 0 for removing
+    # the tile) into the given cell
+    def set_number(self, row, col, number):
+        was_occupied = self.cells[row, col] != 0
+        self.cells[row, col] = number_to_exponent(number) if number else 0
+        if was_occupied == bool(number):
+            return
+        # update the indexes for the added or removed tile
+        if number:
+            self._row_fill_counts[row] += 1
+            self._column_heights[col] = max(self._column_heights[col], row + 1)
+            self.bitboard.set(row, col)
+        else:
+            self._row_fill_counts[row] -= 1
+            self.bitboard.unset(row, col)
+            if self._column_heights[col] == row + 1:
+                occupied = np.flatnonzero(self.cells[:row, col])
+                self._column_heights[col] = occupied[-1] + 1 if len(occupied) else 0
+
+    # A method that creates a Tile object for the given cell (None if empty)
+    def get_tile(self, row, col):
+        exponent = self.cells[row, col]
+        return Tile(exponent_to_number(exponent)) if exponent else None
+
+    # A method that creates the tile matrix (numpy object array of Tile objects
+    # with None for the empty cells) corresponding to this board
+    def to_tile_matrix(self):
+        tile_matrix = np.full((self.grid_height, self.grid_width), None)
+        for row, col in zip(*np.nonzero(self.cells)):
+            tile_matrix[row, col] = self.get_tile(row, col)
+        return tile_matrix
+
+    # A method that returns the numbers on the tiles (0 for the empty cells)
+    def to_numbers(self):
+        return np.where(self.cells > 0, np.left_shift(1, self.cells, dtype=np.int64), 0)
+
+    # A method that returns whether a tile with the given number is on the board
+    def contains(self, number):
+        return bool((self.cells == number_to_exponent(number)).any())
+
+    # A method that returns the largest number on the board (0 if empty)
+    def max_number(self):
+        return exponent_to_number(self.cells.max())
+
+    # A method for doubling the numbers on all the tiles
+    def double_tiles(self):
+        self.cells[self.cells > 0] += 1
+
+    # A method that removes the full rows and moves the rows above them down,
+    # returning the number of the removed rows
+    def clear_full_rows(self):
+        # the row fill counts show the full rows without checking the cells
+        if not (self._row_fill_counts == self.grid_width).any():
+            return 0
+        rows_cleared = int(clear_full_rows(self.cells))
+        self.update_indexes()
+        return rows_cleared
+
+    # A method that merges the vertically adjacent tiles with the same number
+    # from the bottom to the top of each column (the tiles above a merged tile
+    # are moved down by one) and returns the exponents of the merged tiles in
+    # the order of the merges (column by column, from the bottom to the top)
+    def merge_tiles(self):
+        merged = merge_columns(self.cells)[1]
+        exponents = [int(exponent) for exponent in self.cells.T[merged.T]]
+        if exponents:
+            self.update_indexes()
+        return exponents
+
+    # A method that labels the groups of 4-connected tiles, returning a dict
+    # that maps the (row, col) position of each tile to its label
+    def label_components(self):
+        self.components.update(self.cells)
+        return self.components.to_dict()
+
+    # A method that moves each labelled group of tiles that does not touch the
+    # bottom row down by one row
+    def move_down_components(self, labels):
+        components = {}
+        for loc, label in labels.items():
+            components.setdefault(label, []).append(loc)
+        for component in components.values():
+            if min(r for r, c in component) == 0:
+                continue
+            # move the lower tiles first so that no tile is overwritten
+            for r, c in sorted(component):
+                self.cells[r - 1, c], self.cells[r, c] = self.cells[r, c], 0
+        self.update_indexes()
+
+    # A method that moves each group of tiles that does not touch the bottom
+    # row down by one row by using the component index (only the groups that
+    # changed since the last call are labelled again), returns whether any
+    # tile was moved
+    def move_down_floating_components(self):
+        self.components.update(self.cells)
+        floating = self.components.floating_components()
+        if not floating:
+            return False
+        rows = np.concatenate([rows for rows, cols in floating])
+        cols = np.concatenate([cols for rows, cols in floating])
+        # the cells below the floating groups are empty or in the same group,
+        # so all the groups can be moved at once
+        exponents = self.cells[rows, cols]
+        self.cells[rows, cols] = 0
+        self.cells[rows - 1, cols] = exponents
+        self.update_indexes()
+        return True
+
+    # A method that returns the labels of the groups of 4-connected tiles as an
+    # integer matrix (see label_cells) computed from the whole board at once
+    def label_array(self):
+        return label_cells(self.cells > 0)
+
+    # A method that lets all the groups of tiles not connected to the bottom row
+    # fall until they rest on the bottom row or other tiles, returns whether
+    # any tile was moved
+    def settle_components(self):
+        # the component index tells cheaply whether any group is floating
+        self.components.update(self.cells)
+        if not self.components.floating:
+            return False
+        moved = bool(drop_floating_cells(self.cells, settle=True))
+        self.update_indexes()
+        return moved
+
+    # A method that removes the free tiles found by scanning each column from
+    # the top-most row down (a tile is kept when the cells from it up to the
+    # top-most row are all occupied), returning the removed numbers in order
+    def delete_free_tiles(self):
+        occupied = self.cells > 0
+        connected = np.logical_and.accumulate(occupied[::-1], axis=0)[::-1]
+        free = occupied & ~connected
+        removed = [exponent_to_number(e) for e in self.cells[::-1].T[free[::-1].T]]
+        self.cells[free] = 0
+        self.update_indexes()
+        return removed
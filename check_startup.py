@@ -0,0 +1,62 @@
+################################################################################
+#                                                                              #
+# Startup check: measures the time of importing the game logic modules in new  #
+# interpreters and checks that no GUI module (pygame, tkinter) is imported     #
+#                                                                              #
+# usage: python check_startup.py --budget 0.3 --runs 5                         #
+#                                                                              #
+################################################################################
+
+import argparse  # used for parsing the command-line arguments
+import json
+import os
+import statistics
+import subprocess  # used for running the imports in new interpreters
+import sys
+
+# the modules used by the headless tools (the simulations and the tournaments)
+logic_modules = ("game_engine", "batch_game_grid", "tournament", "replay")
+# the modules that must not be imported by the game logic modules
+gui_modules = ("pygame", "tkinter")
+
+# the code run in a new interpreter: it imports the modules and prints the
+# import time in seconds and the GUI modules that were imported as JSON
+measure_code = """
+import json, sys, time
+start_time = time.perf_counter()
+for module in %r:
+    __import__(module)
+seconds = time.perf_counter() - start_time
+print(json.dumps({"seconds": seconds, "gui_modules": [m for m in %r if m in sys.modules]}))
+"""
+
+
+# A function that imports the given modules in a new interpreter and returns the
+# import time in seconds and the GUI modules that were imported
+def measure_import(modules=logic_modules):
+    code = measure_code % (tuple(modules), gui_modules)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    result = json.loads(output.splitlines()[-1])
+    return result["seconds"], result["gui_modules"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the game logic modules.")
+    parser.add_argument("--budget", type=float, default=0.3,
+                        help="maximum median import time in seconds")
+    parser.add_argument("--runs", type=int, default=5, help="number of new interpreters")
+    args = parser.parse_args()
+
+    results = [measure_import() for _ in range(args.runs)]
+    median = statistics.median(seconds for seconds, _ in results)
+    imported = sorted({module for _, modules in results for module in modules})
+    print("median import time  %.3f s (budget %.3f s)" % (median, args.budget))
+    print("GUI modules imported %s" % (", ".join(imported) or "none"))
+    # exit with a non-zero status when the check fails
+    if median > args.budget or imported:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+# A class for keeping track of the groups of 4-connected tiles (components) on
+# a board incrementally by using a union-find structure over per-cell labels.
+# Only the occupancy of the cells matters: update compares the given occupancy
+# with the last one and only the tiles that appeared or disappeared (and the
+# components they belonged to) are processed, so detecting the floating
+# components costs proportional to the changed region of the board.
+class ComponentIndex:
+    def __init__(self, grid_h, grid_w):
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.reset()
+
+    # A method for removing all the cells from the index
+    def reset(self):
+        # the union-find label of each occupied cell (0 for the empty cells)
+        self.labels = np.zeros((self.grid_height, self.grid_width), dtype=np.int32)
+        self.occupied = np.zeros((self.grid_height, self.grid_width), dtype=bool)
+        # parent[label] is the parent of the label in the union-find forest
+        self.parent = [0]
+        # the cells of each component and the components not touching the
+        # bottom row, both keyed by the root label of the component
+        self.members = {}
+        self.floating = set()
+
+    # A method that returns the root label of the component of the given label
+    def find(self, label):
+        parent = self.parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]  # path halving
+            label = parent[label]
+        return label
+
+    # A method for merging the components of the given labels
+    def union(self, label_a, label_b):
+        root_a, root_b = self.find(label_a), self.find(label_b)
+        if root_a == root_b:
+            return root_a
+        # the larger component becomes the root of the merged component
+        if len(self.members[root_a]) < len(self.members[root_b]):
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.members[root_a] |= self.members.pop(root_b)
+        if root_b not in self.floating:
+            self.floating.discard(root_a)
+        self.floating.discard(root_b)
+        return root_a
+
+    # A method for adding the given (row, col) cells as occupied cells
+    def add_cells(self, cells):
+        for row, col in cells:
+            label = len(self.parent)
+            self.parent.append(label)
+            self.labels[row, col] = label
+            self.occupied[row, col] = True
+            self.members[label] = {(row, col)}
+            if row > 0:
+                self.floating.add(label)
+            for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                if 0 <= r < self.grid_height and 0 <= c < self.grid_width and self.occupied[r, c]:
+                    self.union(label, self.labels[r, c])
+
+    # A method for removing the given (row, col) cells, the remaining cells of
+    # their components are labelled again as they may be split into parts
+    def remove_cells(self, cells):
+        removed = set(cells)
+        roots = {self.find(self.labels[row, col]) for row, col in removed}
+        remaining = []
+        for root in roots:
+            remaining.extend(self.members.pop(root) - removed)
+            self.floating.discard(root)
+        for row, col in removed.union(remaining):
+            self.labels[row, col] = 0
+            self.occupied[row, col] = False
+        # the remaining cells can only be connected to each other
+        self.add_cells(remaining)
+
+    # A method for updating the index according to the given occupancy matrix
+    # (a boolean matrix or the exponent matrix of a board)
+    def update(self, occupied):
+        occupied = np.asarray(occupied, dtype=bool)
+        changed = occupied != self.occupied
+        if not changed.any():
+            return
+        # start over when too many labels are used since the last reset
+        if len(self.parent) > 4 * self.grid_height * self.grid_width:
+            self.reset()
+            self.add_cells(zip(*np.nonzero(occupied)))
+            return
+        self.remove_cells(zip(*np.nonzero(changed & self.occupied)))
+        self.add_cells(zip(*np.nonzero(changed & occupied)))
+
+    # A method that returns the cells of each component that does not touch
+    # the bottom row as a list of (rows, cols) index arrays
+    def floating_components(self):
+        components = []
+        for root in self.floating:
+            rows, cols = zip(*self.members[root])
+            components.append((np.array(rows), np.array(cols)))
+        return components
+
+    # A method that returns a dict mapping the (row, col) position of each
+    # occupied cell to the root label of its component
+    def to_dict(self):
+        return {(row, col): self.find(self.labels[row, col])
+                for row, col in zip(*np.nonzero(self.occupied))}
@@ -0,0 +1,213 @@
+################################################################################
+#                                                                              #
+# Replay corpus: many replays appended to one data file with a fixed-width    #
+# index of the games, so millions of games can be filtered and aggregated with #
+# NumPy without parsing the replays                                            #
+#                                                                              #
+# usage: python corpus.py add games.t2c replays/*.t2r                          #
+#        python corpus.py stats games.t2c --min-score 1000                     #
+#        python corpus.py rebuild games.t2c 0 42 --min-tile 512                #
+#                                                                              #
+################################################################################
+
+import argparse  # used for parsing the command-line arguments
+import mmap  # used for reading the replays without loading the data file
+import os
+import struct
+
+import numpy as np
+
+from replay import Replay, play_replay  # used for decoding and replaying the games
+
+# The corpus is stored in two append-only files: the data file (the encoded
+# replays one after the other) and the index file (path + ".idx") which starts
+# with the index header (the magic bytes, the version and the record size as
+# uint32 values) followed by one fixed-width record per game. The index is
+# memory-mapped as a NumPy structured array, so e.g.
+#   corpus.index["score"][corpus.index["max_tile"] >= 1024].mean()
+# only reads the columns of the index. A game is added by appending its replay
+# to the data file before its record, so a crash can only leave unindexed bytes
+# at the end of the data file (and a partial record, which is ignored).
+index_magic = b"T2CI"
+index_version = 1
+index_dtype = np.dtype([
+    ("offset", "<u8"),    # the position of the replay in the data file
+    ("length", "<u4"),    # the length of the replay in bytes
+    ("seed", "<u8"),      # the seed of the game
+    ("score", "<u8"),     # the final score
+    ("max_tile", "<u4"),  # the largest number on the final board
+    ("ticks", "<u4"),     # the number of fall ticks of the game
+])
+index_header_size = 16
+
+
+# A class for a replay corpus (the files are created if they do not exist)
+class ReplayCorpus:
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        if not os.path.exists(self.index_path):
+            with open(self.index_path, "wb") as file:
+                file.write(index_magic + struct.pack("<III", index_version, index_dtype.itemsize, 0))
+            open(path, "ab").close()
+        with open(self.index_path, "rb") as file:
+            header = file.read(index_header_size)
+        if header[:4] != index_magic:
+            raise ValueError("not a replay corpus index: %s" % self.index_path)
+        version, record_size, _ = struct.unpack("<III", header[4:])
+        if version != index_version or record_size != index_dtype.itemsize:
+            raise ValueError("unsupported replay corpus version %d" % version)
+        # the memory maps are opened on first use and reopened after appending
+        self._index = None
+        self._data = None
+
+    def __len__(self):
+        return len(self.index)
+
+    # the records of the games as a read-only memory-mapped structured array
+    @property
+    def index(self):
+        if self._index is None:
+            count = (os.path.getsize(self.index_path) - index_header_size) // index_dtype.itemsize
+            if count == 0:
+                self._index = np.zeros(0, dtype=index_dtype)
+            else:
+                self._index = np.memmap(self.index_path, dtype=index_dtype, mode="r",
+                                        offset=index_header_size, shape=(count,))
+        return self._index
+
+    # A method for closing the memory maps (they are reopened when needed)
+    def close(self):
+        self._index = None
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # A method for appending an encoded replay to the corpus, returns the number
+    # of the game in the corpus. The final statistics of the game (a dictionary
+    # with the score, max_tile and ticks entries as returned by
+    # tournament.play_game) are computed by replaying the game when not given.
+    def append(self, replay_bytes, result=None):
+        return self.extend([(replay_bytes, result)])[0]
+
+    # A method for appending many (replay_bytes, result) pairs at once (the
+    # files are opened once), returns the numbers of the games in the corpus
+    def extend(self, games):
+        self.close()
+        records = []
+        with open(self.path, "ab") as file:
+            offset = file.seek(0, os.SEEK_END)
+            for replay_bytes, result in games:
+                replay = Replay.from_bytes(replay_bytes)
+                if result is None:
+                    engine = play_replay(replay)
+                    result = {"score": engine.score, "ticks": engine.ticks,
+                              "max_tile": engine.grid.board.max_number()}
+                records.append((offset, len(replay_bytes), replay.seed, result["score"],
+                                result["max_tile"], result["ticks"]))
+                file.write(replay_bytes)
+                offset += len(replay_bytes)
+        # a partial record left by an interrupted append is overwritten
+        count = (os.path.getsize(self.index_path) - index_header_size) // index_dtype.itemsize
+        with open(self.index_path, "r+b") as file:
+            file.truncate(index_header_size + count * index_dtype.itemsize)
+            file.seek(0, os.SEEK_END)
+            file.write(np.array(records, dtype=index_dtype).tobytes())
+        return range(count, count + len(records))
+
+    # A method for appending the replay files at the given paths
+    def add_files(self, paths):
+        def read_file(path):
+            with open(path, "rb") as file:
+                return file.read(), None
+        return self.extend(read_file(path) for path in paths)
+
+    # A method that returns the encoded replay of the i-th game
+    def get_bytes(self, i):
+        record = self.index[i]
+        if self._data is None:
+            with open(self.path, "rb") as file:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        offset = int(record["offset"])
+        return self._data[offset:offset + int(record["length"])]
+
+    def get_replay(self, i):
+        return Replay.from_bytes(self.get_bytes(i))
+
+    # A method that replays the i-th game and returns the game grid in its
+    # final state
+    def rebuild(self, i):
+        return play_replay(self.get_replay(i)).grid
+
+    # A method that returns the numbers of the games selected by a boolean
+    # mask of the index or by a condition on the records, e.g.
+    #   corpus.select(lambda index: index["score"] > 1000)
+    def select(self, condition):
+        mask = condition(self.index) if callable(condition) else condition
+        return np.flatnonzero(mask)
+
+
+# A function that aggregates the given index records (e.g. corpus.index or a
+# selection of it) with NumPy
+def summarize(index):
+    if len(index) == 0:
+        return {"games": 0}
+    scores = index["score"]
+    tiles, counts = np.unique(index["max_tile"], return_counts=True)
+    return {
+        "games": len(index),
+        "score_mean": float(scores.mean()),
+        "score_median": float(np.median(scores)),
+        "score_min": int(scores.min()),
+        "score_max": int(scores.max()),
+        "max_tile_counts": {int(tile): int(count) for tile, count in zip(tiles, counts)},
+        "ticks_mean": float(index["ticks"].mean()),
+        "replay_bytes": int(index["length"].sum(dtype=np.uint64)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query a replay corpus.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="append replay files to the corpus")
+    add.add_argument("corpus")
+    add.add_argument("files", nargs="+")
+    stats = commands.add_parser("stats", help="print the statistics of the selected games")
+    stats.add_argument("corpus")
+    rebuild = commands.add_parser("rebuild", help="print the final boards of the selected games")
+    rebuild.add_argument("corpus")
+    rebuild.add_argument("games", type=int, nargs="*", help="numbers of the games (default: all)")
+    for command in (stats, rebuild):
+        command.add_argument("--min-score", type=int, default=0, help="only the games with this score or more")
+        command.add_argument("--min-tile", type=int, default=0, help="only the games with this tile or larger")
+    args = parser.parse_args()
+
+    with ReplayCorpus(args.corpus) as corpus:
+        if args.command == "add":
+            corpus.add_files(args.files)
+            print("%d games in %s" % (len(corpus), args.corpus))
+            return
+        index = corpus.index
+        selected = corpus.select((index["score"] >= args.min_score) & (index["max_tile"] >= args.min_tile))
+        if args.command == "stats":
+            for key, value in summarize(index[selected]).items():
+                print("%-20s %s" % (key, round(value, 2) if isinstance(value, float) else value))
+            return
+        if args.games:
+            selected = np.intersect1d(args.games, selected)
+        for i in selected:
+            grid = corpus.rebuild(i)
+            print("game %d (seed %d, score %d)" % (i, index[i]["seed"], grid.score))
+            # the top row of the grid is printed first
+            for row in grid.board.to_numbers()[::-1]:
+                print(" ".join("%5s" % (number or ".") for number in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import random  # used for creating tetrominoes with random types (shapes)
+
+from game_grid import GameGrid  # the class for modeling the game grid
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+from piece_generator import create_generator  # used for choosing the types
+
+
+# A class that runs the rules of Tetris 2048 without drawing anything, so that
+# a game can be simulated step by step (e.g. by a bot) as fast as possible.
+# Rendering is optional: any callable registered with add_observer is called
+# with the engine after each fall tick (see Tetris_2048.start for an example).
+class GameEngine:
+    # the actions (key names) understood by apply_action and step
+    actions = ("left", "right", "down", "up", "s")
+    # the types (shapes) of the tetrominoes created during the game
+    tetromino_types = ['I', '.', 'O', 'Z', 'S', 'L', 'J', 'T']
+
+    def __init__(self, grid_h=20, grid_w=12, stop_on_win=False, gravity="step",
+                 wall_kicks=False, seed=None, generator="uniform"):
+        # set the dimensions of the game grid as the given arguments
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        # the gravity mode of the game grid ("step" or "settle")
+        self.gravity = gravity
+        # when wall_kicks is True, the rotations use the SRS wall kicks
+        self.wall_kicks = wall_kicks
+        # when stop_on_win is True, reaching the 2048 tile ends the game
+        self.stop_on_win = stop_on_win
+        # the name of the piece generator choosing the types of the tetrominoes
+        # ("uniform", "bag" or "history", see piece_generator)
+        self.generator_name = generator
+        # the callables notified after each fall tick and after each action
+        self.observers = []
+        self.action_observers = []
+        self.reset(seed)
+
+    # A method for starting a new game with the given seed (a new random seed
+    # when it is None), returns the initial observation. All the random numbers
+    # of a game (the types, the tile numbers and the positions of the
+    # tetrominoes) are drawn from self.rng, so the same seed and the same
+    # actions give the same game.
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # the last state read from (or restored to) self.rng, None after the
+        # rng is used, so the snapshots taken between two spawns share it
+        self.rng_state = None
+        self.generator = create_generator(self.generator_name, self.tetromino_types, self.rng)
+        self.grid = GameGrid(self.grid_height, self.grid_width, self.gravity)
+        # the number of fall ticks since the start of the game
+        self.ticks = 0
+        self.spawn_tetromino()
+        return self.observe()
+
+    # A method that returns the state of the game (the state of the grid, the
+    # number of fall ticks and the states of the random number generator and
+    # the piece generator) as a tuple of compact values. A snapshot is never
+    # changed, so it can be restored any number of times (e.g. for searching
+    # the moves or for undoing them).
+    def snapshot(self):
+        if self.rng_state is None:
+            self.rng_state = self.rng.getstate()
+        return (self.grid.snapshot(), self.ticks, self.rng_state, self.generator.get_state())
+
+    # A method for restoring a state returned by snapshot (the game grid is
+    # changed in place, so the observers keep drawing the same grid)
+    def restore(self, snapshot):
+        grid_state, self.ticks, rng_state, generator_state = snapshot
+        self.grid.restore(grid_state)
+        if rng_state is not self.rng_state:
+            self.rng.setstate(rng_state)
+            self.rng_state = rng_state
+        self.generator.set_state(generator_state)
+
+    # A method for registering a callable that is invoked as observer(engine)
+    # after each fall tick (e.g. for drawing the game grid)
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    # A method for registering a callable that is invoked as
+    # observer(engine, action) after each action (e.g. for recording a replay)
+    def add_action_observer(self, observer):
+        self.action_observers.append(observer)
+
+    def remove_action_observer(self, observer):
+        self.action_observers.remove(observer)
+
+    @property
+    def current_tetromino(self):
+        return self.grid.current_tetromino
+
+    @property
+    def score(self):
+        return self.grid.score
+
+    # the game is done when it is over (or won if stop_on_win is set)
+    @property
+    def done(self):
+        return self.grid.game_over or (self.stop_on_win and self.grid.game_won)
+
+    # A method for creating the next tetromino and putting it on the grid
+    def spawn_tetromino(self):
+        # the type (shape) of the tetromino is determined by the generator
+        random_type = self.generator.next_type()
+        self.grid.current_tetromino = Tetromino(random_type, self.rng, self.grid_height, self.grid_width)
+        # the state of the rng is changed by the generator and the tetromino
+        self.rng_state = None
+        return self.grid.current_tetromino
+
+    # A method that applies a key press to the current tetromino and then lets
+    # the floating tile groups on the grid fall (as done in Tetris_2048.start).
+    # Returns whether the tetromino was moved/rotated.
+    def apply_action(self, action):
+        tetromino = self.grid.current_tetromino
+        moved = False
+        if tetromino is not None:
+            if action in ("left", "right", "down"):
+                moved = tetromino.move(action, self.grid)
+            elif action == "up":
+                moved = tetromino.rotate(self.grid, self.wall_kicks)
+            elif action == "s":
+                # hard drop: move the tetromino down until it can't move further
+                moved = tetromino.hard_drop(self.grid)
+        self.grid.move_down_components()
+        for observer in self.action_observers:
+            observer(self, action)
+        return moved
+
+    # A method for advancing the game by one fall tick: the current tetromino
+    # moves down by one, the tiles on the grid are merged and the tetromino is
+    # locked (and a new one is created) when it cannot move down any further
+    def tick(self):
+        if self.grid.game_over:
+            return
+        self.ticks += 1
+        tetromino = self.grid.current_tetromino
+        success = tetromino.move("down", self.grid)
+        self.grid.merge_tiles()
+        if not success:
+            tiles, pos = tetromino.get_min_bounded_tile_matrix(True)
+            if not self.grid.update_grid(tiles, pos):
+                self.spawn_tetromino()
+        for observer in self.observers:
+            observer(self)
+
+    # A method that applies the given action (None for no key press) and then
+    # advances the game by one fall tick, returning (observation, reward, done)
+    def step(self, action=None):
+        score = self.grid.score
+        if action is not None:
+            self.apply_action(action)
+        self.tick()
+        return self.observe(), self.grid.score - score, self.done
+
+    # A method that returns the state of the game as a dictionary whose board
+    # entry stores the exponent of each locked tile (0 for an empty cell)
+    def observe(self):
+        board = self.grid.get_exponent_matrix()
+        tetromino = self.grid.current_tetromino
+        piece = None
+        if tetromino is not None:
+            piece = (tetromino.type, tetromino.bottom_left_cell.x,
+                     tetromino.bottom_left_cell.y)
+        return {
+            "board": board,
+            "piece": piece,
+            "score": self.grid.score,
+            "ticks": self.ticks,
+            "game_over": self.grid.game_over,
+            "game_won": self.grid.game_won,
+        }
@@ -3,17 +3,26 @@ import sys
 import lib.stddraw as stddraw  # used for displaying the game grid
 from lib.color import Color  # used for coloring the game grid
 from point import Point  # used for tile positions
+from board import Board  # used for storing the locked tiles
+from tetromino import Tetromino  # used for restoring the current tetromino
 import numpy as np
 
 
 
 class GameGrid:
-    def __init__(self, grid_h, grid_w):
+    def __init__(self, grid_h, grid_w, gravity="step", use_bitboard=True):
         # set the dimensions of the game grid as the given arguments
         self.grid_height = grid_h
         self.grid_width = grid_w
-        # create a tile matrix to store the tiles locked on the game grid
-        self.tile_matrix = np.full((grid_h, grid_w), None)
+        # the floating tile groups move down by one row each time ("step") or
+        # fall until they rest on other tiles ("settle") in move_down_components
+        self.gravity = gravity
+        # when use_bitboard is True, the tetrominoes check collisions by using
+        # the row occupancy bits of the board instead of checking cell by cell
+        self.use_bitboard = use_bitboard
+        # create a board to store the tiles locked on the game grid (as the
+        # exponents of their numbers, Tile objects are created for drawing)
+        self.board = Board(grid_h, grid_w)
         self.current_tetromino = None
         # the game_over flag shows whether the game is over or not
         self.game_over = False
@@ -25,9 +34,20 @@ class GameGrid:
         # thickness values used for the grid lines and the grid boundaries
         self.line_thickness = 0.002
         self.box_thickness = 10 * self.line_thickness
+        # show_ghost shows where the current tetromino lands on a hard drop
+        # (drawn as outlined cells with ghost_color)
+        self.show_ghost = True
+        self.ghost_color = Color(200, 200, 200)
+        self.ghost_thickness = 0.004
+        # the cached pictures of the layers that do not change from frame to
+        # frame (see draw_layer) and the size of the game grid on the canvas
+        # they were created for
+        self.layers = {}
+        self.layer_size = None
 
 
         self.score = 0 # score object
+        self.lines_cleared = 0 # number of the full rows cleared so far
         self.winner = None
         self.doubled = False # first double'ing the tiles
         self.quadrupled = False # second double
@@ -35,31 +55,72 @@ class GameGrid:
 
 
 
-    # A method for displaying the game grid
-    def display(self):
-        # clear the background to empty_cell_color
-        stddraw.clear(self.empty_cell_color)
-        # draw the game grid
+    # the tiles locked on the game grid as a matrix of Tile objects (None for
+    # the empty cells), created from the board each time it is accessed
+    @property
+    def tile_matrix(self):
+        return self.board.to_tile_matrix()
+
+    # the number of rows up to the top-most locked tile of each column and the
+    # number of locked tiles in each row (read-only, kept up to date by the board)
+    @property
+    def column_heights(self):
+        return self.board.column_heights
+
+    @property
+    def row_fill_counts(self):
+        return self.board.row_fill_counts
+
+    # the bitboard used for collision checks (None when use_bitboard is False)
+    @property
+    def bitboard(self):
+        return self.board.bitboard if self.use_bitboard else None
+
+    # A method for displaying the game grid, the drawing is shown for pause ms
+    # (pause=None only draws it, the caller shows the drawing)
+    def display(self, pause=250):
+        # draw the background (the empty cells and the inner grid lines)
+        self.draw_layer("background", self.draw_background)
+        # draw the tiles locked on the game grid
         self.draw_grid()
+        # draw the landing preview of the current tetromino below it
+        if self.show_ghost and self.current_tetromino is not None:
+            self.draw_ghost()
         # draw the current/active tetromino if it is not None
         # (the case when the game grid is updated)
         if self.current_tetromino is not None:
             self.current_tetromino.draw()
         # draw a box around the game grid
-        self.draw_boundaries()
-        # show the resulting drawing with a pause duration = 250 ms
-        stddraw.show(250)
-
+        self.draw_layer("boundaries", self.draw_boundaries)
         self.draw_score() #calls the draw_core function to display the overall score
+        # show the resulting drawing with the given pause duration
+        if pause is not None:
+            stddraw.show(pause)
+
+    # A method for drawing a layer of the game grid that does not change from
+    # frame to frame by drawing its cached picture, the picture is created by
+    # calling draw once for each size of the game grid on the canvas
+    def draw_layer(self, name, draw):
+        size = stddraw.pixelSize(self.grid_width, self.grid_height)
+        if size != self.layer_size:
+            self.layers = {}
+            self.layer_size = size
+        center_x, center_y = (self.grid_width - 1) / 2, (self.grid_height - 1) / 2
+        if name not in self.layers:
+            self.layers[name] = stddraw.createSprite(self.grid_width, self.grid_height,
+                                                     lambda x, y: draw(), center_x, center_y)
+        stddraw.drawSprite(self.layers[name], center_x, center_y)
 
     def draw_grid(self):
-        # for each cell of the game grid
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                # if the current grid cell is occupied by a tile
-                if self.tile_matrix[row][col] is not None:
-                    # draw this tile
-                    self.tile_matrix[row][col].draw(Point(col, row))
+        # for each grid cell occupied by a tile
+        for row, col in zip(*np.nonzero(self.board.cells)):
+            # draw this tile
+            self.board.get_tile(row, col).draw(Point(col, row))
+
+    # A method for drawing the empty cells and the inner lines of the game grid
+    # (the tiles are drawn over this background)
+    def draw_background(self):
+        stddraw.clear(self.empty_cell_color)
         # draw the inner lines of the game grid
         stddraw.setPenColor(self.line_color)
         stddraw.setPenRadius(self.line_thickness)
@@ -72,6 +133,18 @@ class GameGrid:
             stddraw.line(start_x, y, end_x, y)
         stddraw.setPenRadius()  # reset the pen radius to its default value
 
+    # A method for drawing the outlines of the cells where the current tetromino
+    # lands on a hard drop (the drop distance is found from the column heights,
+    # so the drop is not simulated row by row)
+    def draw_ghost(self):
+        stddraw.setPenColor(self.ghost_color)
+        stddraw.setPenRadius(self.ghost_thickness)
+        for x, y in self.current_tetromino.get_landing_positions(self):
+            # draw only the cells that are inside the game grid
+            if y < self.grid_height:
+                stddraw.square(x, y, 0.45)
+        stddraw.setPenRadius()  # reset the pen radius to its default value
+
    # A method for drawing the boundaries around the game gridhod for drawing the cells and the lines of the game grid
     def draw_boundaries(self):
         # draw a bounding box around the game grid as a rectangle
@@ -92,8 +165,8 @@ class GameGrid:
         # have tiles with position.y >= grid_height
         if not self.is_inside(row, col):
             return False  # the cell is not occupied as it is outside the grid
-        # the cell is occupied by a tile if it is not None
-        return self.tile_matrix[row][col] is not None
+        # the cell is occupied by a tile if it is not empty
+        return self.board.cells[row, col] != 0
 
     def is_inside(self, row, col):
         if row < 0 or row >= self.grid_height:
@@ -119,7 +192,7 @@ class GameGrid:
                     pos.x = blc_position.x + col
                     pos.y = blc_position.y + (n_rows - 1) - row
                     if self.is_inside(pos.y, pos.x):
-                        self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
+                        self.board.set_number(pos.y, pos.x, tiles_to_lock[row][col].number)
                     # the game is over if any placed tile is above the game grid
                     else:
                         self.game_over = True
@@ -157,30 +230,13 @@ class GameGrid:
 
 # a method for deleting the hanging/floating free tiles and adding the value of these tiles to score
     def delete_free_tiles_and_update_score(self):
-        for col in range(self.grid_width): # scan each column for free tile
-            conqat = [False] * self.grid_height #initialize a list to keep track of 4-connected tiles
-
-            # scan from botom to tpo to find the first conqateneted tile
-            for row in range(self.grid_height - 1, -1, -1):
-                if self.tile_matrix[row][col] is not None:
-                    if row == self.grid_height - 1 or conqat[row + 1]: #if the current tile is connected, mark it as connected
-                        conqat[row] = True
-                    else:
-                        # if it is not connected, thern it is a free tile. and it needs to be removed
-                          # and its value needs to be added up to the overall score
-                        self.update_score(self.tile_matrix[row][col].number)
-                        self.tile_matrix[row][col] = None
+        self.add_tile_points(self.board.delete_free_tiles())
 
 
 #method to clear full rows and move down the rows above
     def clear_and_move_down_rows(self):
-        rows_cleared = 0
-        for row in range(self.grid_height):
-            if all(self.tile_matrix[row]):  # Check if the row is fully occupied
-                rows_cleared += 1
-            elif rows_cleared > 0:  # Move rows down if any rows were cleared above
-                self.tile_matrix[row - rows_cleared] = self.tile_matrix[row].copy()
-                self.tile_matrix[row] = [None] * self.grid_width  # Clear the current row as it has been moved down
+        rows_cleared = self.board.clear_full_rows()
+        self.lines_cleared += rows_cleared
 
         # Update the score based on the number of rows cleared
         self.score += rows_cleared * 100
@@ -188,88 +244,77 @@ class GameGrid:
 #method to merge tiles of the same value that are on top of each other- from top to bottom
 
     def merge_tiles(self):
-        for col in range(self.grid_width):
-            row = 0  # start from the bottom row
-            while row < self.grid_height - 1:  # check toward the top-most row
-                current_tile = self.tile_matrix[row][col]
-                above_tile = self.tile_matrix[row + 1][col]
-
-                # if the values are the same, start merging
-                if current_tile is not None and above_tile is not None:
-                    if current_tile.number == above_tile.number:
-                        merged_number = current_tile.number * 2
-                        current_tile.number = merged_number
-                        self.tile_matrix[row + 1][col] = None  # remove the top-most tile
-                        self.update_score(merged_number)  #update the score
-
-                        # move down tiles above
-                        for r in range(row + 1, self.grid_height - 1):
-                            self.tile_matrix[r][col] = self.tile_matrix[r + 1][col]
-                        self.tile_matrix[self.grid_height - 1][col] = None
-                row += 1  # move to the next tile
+        # the board merges the tiles and returns the exponents of the merged tiles
+        self.add_tile_points([2 ** exponent for exponent in self.board.merge_tiles()])
         self.check_win()
 
+# method to add the numbers of the merged/removed tiles to the score one by one
+# (the board is updated before the points are added, so a number is doubled for
+# each doubling of the tiles that happened while adding the previous numbers)
+    def add_tile_points(self, numbers):
+        doublings = 0
+        for number in numbers:
+            flags = (self.doubled, self.quadrupled)
+            self.update_score(number << doublings)
+            if (self.doubled, self.quadrupled) != flags:
+                doublings += 1
+
 
     #method to label components for identification of connected groups of tiles
 
     def label_components(self):
-        label_count = 1
-        labels = {}
-
-        for col in range(self.grid_width):
-            for row in range(self.grid_height):
-                if self.tile_matrix[row][col] is not None and (row, col) not in labels:
-                    self.flood_fill(row, col, label_count, labels)
-                    label_count += 1
-        return labels
-
-    # helper method to perform flood fill for the label_components method
-
-    def flood_fill(self, row, col, label, labels):
-        # dfs with the use of stack
-        stack = [(row, col)]
-        while stack:
-            r, c = stack.pop()
-            if (r, c) not in labels and self.tile_matrix[r][c] is not None:
-                labels[(r, c)] = label
-                # adding-up the neighbour tiles to the stack
-                if r > 0: stack.append((r - 1, c))
-                if r < self.grid_height - 1: stack.append((r + 1, c))
-                if c > 0: stack.append((r, c - 1))
-                if c < self.grid_width - 1: stack.append((r, c + 1))
-
+        return self.board.label_components()
 
 #method to move down components based on labels assigned by label_components
 
-    def move_down_components(self, labels):
-        for label in set(labels.values()):
-            # only checks the bottom-empty tiles
-            component = [loc for loc, lbl in labels.items() if lbl == label]
-            min_row = min(r for r, c in component)
-            if min_row == 0 or all(self.tile_matrix[r - 1][c] is not None for r, c in component):
-                continue
-            for r, c in component:
-                self.tile_matrix[r][c], self.tile_matrix[r - 1][c] = None, self.tile_matrix[r][c]
+    # (when labels is not given, the incrementally updated component index of
+    # the board is used instead of labelling the whole grid again, or all the
+    # floating groups are settled at once when gravity is set as "settle")
+    def move_down_components(self, labels=None):
+        if labels is None and self.gravity == "settle":
+            self.board.settle_components()
+        elif labels is None:
+            self.board.move_down_floating_components()
+        else:
+            self.board.move_down_components(labels)
 
 
 # method to double the value of all tiles on the grid
 
     def double_tiles_value(self):
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                if self.tile_matrix[row][col] is not None:  # if there exist a tile
-                    self.tile_matrix[row][col].number *= 2
-                    self.tile_matrix[row][col].update_colors()
+        self.board.double_tiles()
 
 #inci
+    # a method that sets the game_won flag when a 2048 tile is on the grid
+    # (drawing the game won screen is left to the caller, see draw_game_won)
     def check_win(self):
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                if self.tile_matrix[row][col] is not None and self.tile_matrix[row][col].number == 2048:
-                    self.game_won = True
-                    self.draw_game_won()
-                    return True
-        return False # shows gui
+        if self.board.contains(2048):
+            self.game_won = True
+            return True
+        return False
+
+    # a method that returns the state of the game on the grid (the board, the
+    # score, the flags and the current tetromino) as a tuple of compact values
+    def snapshot(self):
+        tetromino = self.current_tetromino
+        return (self.board.snapshot(), self.score, self.lines_cleared,
+                self.doubled, self.quadrupled, self.game_over, self.game_won,
+                tetromino.get_state() if tetromino is not None else None)
+
+    # a method for restoring a state returned by snapshot (the current
+    # tetromino is created again from its state)
+    def restore(self, state):
+        board, self.score, self.lines_cleared, self.doubled, self.quadrupled, \
+            self.game_over, self.game_won, tetromino = state
+        self.board.restore(board)
+        if tetromino is not None:
+            tetromino = Tetromino.from_state(tetromino, self.grid_height, self.grid_width)
+        self.current_tetromino = tetromino
+
+    # a method that returns the exponents of the locked tiles (2 ** exponent is
+    # the number on the tile) as an integer matrix with 0 for the empty cells
+    def get_exponent_matrix(self):
+        return self.board.cells.copy()
 
     def draw_game_won(self):
         # Continuously update the game screen until an action is taken
@@ -322,7 +367,8 @@ class GameGrid:
         self.game_over = False
         self.game_won = False
         self.score = 0
-        self.tile_matrix = np.full((self.grid_height, self.grid_width), None)
+        self.lines_cleared = 0
+        self.board.clear()
         self.display()  # Redraw the game grid with the initial state
 
 
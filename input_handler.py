@@ -0,0 +1,68 @@
+import collections
+import time
+
+import lib.stddraw as stddraw  # used for receiving the key events
+
+
+# A class for turning the key events of the stddraw window into a queue of
+# timestamped actions. All the pending events are processed on each update, so
+# no key press is lost, and the keys in repeat_keys are repeated while they are
+# held: the first repeat comes das seconds (delayed auto shift) after the press
+# and the next ones every arr seconds (auto repeat rate).
+class InputHandler:
+    repeat_keys = ("left", "right", "down")
+
+    def __init__(self, das=0.17, arr=0.05):
+        self.das = das
+        self.arr = arr
+        # the pending (time, key) actions in the order of their times
+        self.actions = collections.deque()
+        # the time of the next repeat of each held key in repeat_keys
+        self.next_repeat = {}
+        stddraw.enableKeyEvents()
+
+    # A method for processing the pending key events and adding the repeats of
+    # the held keys that are due by now (time.perf_counter() by default)
+    def update(self, now=None):
+        stddraw.pollEvents()
+        # the typed keys are taken from the key events instead
+        stddraw.clearKeysTyped()
+        if now is None:
+            now = time.perf_counter()
+        repeats = []
+        while stddraw.hasNextKeyEvent():
+            key, pressed, event_time = stddraw.nextKeyEvent()
+            if pressed:
+                self.add_repeats(repeats, event_time)
+                repeats.sort()
+                self.actions.extend(repeats)
+                repeats = []
+                self.actions.append((event_time, key))
+                if key in self.repeat_keys:
+                    self.next_repeat[key] = event_time + self.das
+            else:
+                self.add_repeats(repeats, event_time)
+                self.next_repeat.pop(key, None)
+        self.add_repeats(repeats, now)
+        repeats.sort()
+        self.actions.extend(repeats)
+
+    # A method for adding the repeats of the held keys up to the given time
+    def add_repeats(self, repeats, until):
+        for key, repeat_time in self.next_repeat.items():
+            while repeat_time <= until:
+                repeats.append((repeat_time, key))
+                repeat_time += self.arr
+            self.next_repeat[key] = repeat_time
+
+    def has_next_action(self):
+        return len(self.actions) > 0
+
+    # A method that removes the first pending action and returns it as (time, key)
+    def next_action(self):
+        return self.actions.popleft()
+
+    # A method for removing the pending actions and forgetting the held keys
+    def clear(self):
+        self.actions.clear()
+        self.next_repeat.clear()
@@ -10,15 +10,13 @@ commonly used Color objects defined in the color module.
 import time
 import os
 import sys
+import collections
 
+# pygame is imported when the window is created (see _importPygame())
+# and tkinter only in the child processes that display the dialog
+# boxes, so importing this module does not need a display
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
-import pygame
-import pygame.gfxdraw
-import pygame.font
-
-import tkinter as Tkinter
-import tkinter.messagebox as tkMessageBox
-import tkinter.filedialog as tkFileDialog
+pygame = None
 	
 #-----------------------------------------------------------------------
 
@@ -83,6 +81,15 @@ _DEFAULT_PEN_COLOR = BLACK
 _DEFAULT_FONT_FAMILY = 'Helvetica'
 _DEFAULT_FONT_SIZE = 12
 
+# The maximum numbers of the font objects and of the rendered text
+# surfaces kept in the caches used by text() and boldText()
+_FONT_CACHE_SIZE = 32
+_TEXT_CACHE_SIZE = 512
+
+# The maximum number of the pygame.Color objects kept in the cache used by
+# _pygameColor() (one for each RGB value drawn)
+_COLOR_CACHE_SIZE = 1024
+
 _xmin = None
 _ymin = None
 _xmax = None
@@ -97,9 +104,30 @@ _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
 _keysTyped = []
 
+# The key events (key, pressed, time) recorded when enableKeyEvents()
+# is called: pressed is True for a key press and False for a release
+_keyEvents = collections.deque()
+_keyEventsEnabled = False
+
+# The font objects keyed by (family, size, bold) and the rendered text
+# surfaces keyed by (family, size, bold, string, color), the least
+# recently used entry is removed when a cache is full
+_fontCache = collections.OrderedDict()
+_textCache = collections.OrderedDict()
+
+# The pygame.Color objects keyed by (red, green, blue)
+_pygameColors = {}
+
 # Has the window been created?
 _windowCreated = False
 
+# The scratch surface used for drawing while setClip() is in effect, the
+# clipping rectangle (None when there is no restriction) and the
+# background canvas surface
+_clipSurface = None
+_clipRect = None
+_canvasSurface = None
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
@@ -121,12 +149,17 @@ _mousePos = None
 def _pygameColor(c):
     """
     Convert c, an object of type color.Color, to an equivalent object
-    of type pygame.Color.  Return the result.
-    """
-    r = c.getRed()
-    g = c.getGreen()
-    b = c.getBlue()
-    return pygame.Color(r, g, b)
+    of type pygame.Color.  Return the result (shared by the equal
+    colors, it must not be modified).
+    """
+    key = (c.getRed(), c.getGreen(), c.getBlue())
+    color = _pygameColors.get(key)
+    if color is None:
+        if len(_pygameColors) >= _COLOR_CACHE_SIZE:
+            _pygameColors.clear()
+        color = pygame.Color(*key)
+        _pygameColors[key] = color
+    return color
 
 #-----------------------------------------------------------------------
 
@@ -148,6 +181,19 @@ def _factorY(h):
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
 
+def _pixelRect(x, y, w, h, margin=0):
+    """
+    Return the pygame.Rect of the pixels covered by the rectangle of
+    width w and height h whose lower left point is (x, y), extended by
+    margin pixels on each side and limited to the canvas.
+    """
+    left = int(_scaleX(x)) - margin
+    top = int(_scaleY(y + h)) - margin
+    right = int(_scaleX(x + w) + 1) + margin
+    bottom = int(_scaleY(y) + 1) + margin
+    rect = pygame.Rect(left, top, right - left, bottom - top)
+    return rect.clip(pygame.Rect(0, 0, _canvasWidth, _canvasHeight))
+
 def _userX(x):
     return _xmin + x * (_xmax - _xmin) / _canvasWidth
 
@@ -160,6 +206,18 @@ def _userY(y):
     
 #-----------------------------------------------------------------------
 
+def _importPygame():
+    """
+    Import pygame and initialize its font module if this is not done
+    yet.
+    """
+    global pygame
+    if pygame is None:
+        import pygame
+        import pygame.gfxdraw
+        import pygame.font
+        pygame.font.init()
+
 def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     """
     Set the size of the canvas to w pixels wide and h pixels high.
@@ -178,6 +236,8 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     if (w < 1) or (h < 1):
         raise Exception('width and height must be positive')
 
+    _importPygame()
+
     _canvasWidth = w
     _canvasHeight = h
     _background = pygame.display.set_mode([w, h])
@@ -317,8 +377,8 @@ def line(x0, y0, x1, y1):
     y0s = _scaleY(y0)
     x1s = _scaleX(x1)
     y1s = _scaleY(y1)
-    pygame.draw.line(
-       _surface,
+    _drawUnclipped(
+       pygame.draw.line,
        _pygameColor(_penColor),
        (x0s, y0s),
        (x1s, y1s),
@@ -389,8 +449,8 @@ def rectangle(x, y, w, h):
     else:
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.rect(
-            _surface,
+        _drawUnclipped(
+            pygame.draw.rect,
             _pygameColor(_penColor),
             pygame.Rect(xs, ys-hs, ws, hs),
             int(round(_penRadius)))
@@ -480,6 +540,39 @@ def filledPolygon(x, y):
     points.append((xScaled[0], yScaled[0]))
     pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
 
+def _getFont(bold):
+    """
+    Return the font object for the current font family and size
+    (bold if bold is True) from the font cache.
+    """
+    key = (_fontFamily, _fontSize, bold)
+    font = _fontCache.get(key)
+    if font is None:
+        font = pygame.font.SysFont(_fontFamily, _fontSize, bold)
+        if len(_fontCache) >= _FONT_CACHE_SIZE:
+            _fontCache.popitem(last=False)
+        _fontCache[key] = font
+    else:
+        _fontCache.move_to_end(key)
+    return font
+
+def _renderText(s, bold):
+    """
+    Return the surface of string s rendered with the current font and
+    pen color (bold if bold is True) from the text cache.
+    """
+    color = _pygameColor(_penColor)
+    key = (_fontFamily, _fontSize, bold, s, tuple(color))
+    text = _textCache.get(key)
+    if text is None:
+        text = _getFont(bold).render(s, 1, color)
+        if len(_textCache) >= _TEXT_CACHE_SIZE:
+            _textCache.popitem(last=False)
+        _textCache[key] = text
+    else:
+        _textCache.move_to_end(key)
+    return text
+
 def text(x, y, s):
     """
     Draw string s on the background canvas centered at (x, y).
@@ -489,8 +582,7 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, False)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -503,8 +595,7 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, True)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -530,6 +621,54 @@ def picture(pic, x=None, y=None):
     picSurface = pic._surface # violates encapsulation
     _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
 
+def pixelSize(w, h):
+    """
+    Return the (width, height) in pixels of a rectangle of width w and
+    height h on the canvas.
+    """
+    return int(round(_factorX(w))), int(round(_factorY(h)))
+
+def createSprite(w, h, draw, x=0.0, y=0.0):
+    """
+    Create a sprite: a transparent surface of the size of a rectangle of
+    width w and height h centered at (x, y), on which the drawing
+    functions called by draw(x, y) draw as they would draw on the
+    background canvas. Return the surface to be drawn by drawSprite().
+    """
+    global _surface
+    global _xmin
+    global _xmax
+    global _ymin
+    global _ymax
+    _makeSureWindowCreated()
+    ws, hs = pixelSize(w, h)
+    sprite = pygame.Surface((ws, hs), pygame.SRCALPHA)
+    saved = (_surface, _xmin, _xmax, _ymin, _ymax)
+    # draw on the sprite with the scale of the canvas, moving (x, y) to
+    # the center of the sprite
+    x = float(x)
+    y = float(y)
+    xsize, ysize = _xmax - _xmin, _ymax - _ymin
+    _xmin = x - ws / 2.0 * xsize / _canvasWidth
+    _xmax = _xmin + xsize
+    _ymax = y + hs / 2.0 * ysize / _canvasHeight
+    _ymin = _ymax - ysize
+    _surface = sprite
+    try:
+        draw(x, y)
+    finally:
+        _surface, _xmin, _xmax, _ymin, _ymax = saved
+    return sprite
+
+def drawSprite(sprite, x, y):
+    """
+    Draw sprite (created by createSprite()) on the background canvas
+    centered at (x, y).
+    """
+    _makeSureWindowCreated()
+    ws, hs = sprite.get_size()
+    _surface.blit(sprite, (_scaleX(float(x)) - ws / 2.0, _scaleY(float(y)) - hs / 2.0))
+
 def clear(c=WHITE):
     """
     Clear the background canvas to color c, where c is an
@@ -538,6 +677,48 @@ def clear(c=WHITE):
     _makeSureWindowCreated()
     _surface.fill(_pygameColor(c))
 
+def setClip(x=None, y=None, w=None, h=None, margin=0):
+    """
+    Restrict the drawing on the background canvas (including clear())
+    to the rectangle of width w and height h whose lower left point is
+    (x, y), extended by margin pixels on each side. Calling setClip()
+    without arguments removes the restriction.
+    """
+    # The drawing is done on a scratch surface clipped to the rectangle
+    # and only the rectangle is copied to the background canvas when the
+    # restriction is removed. The lines and the outlines of rectangles
+    # are drawn without the clipping area (see _drawUnclipped()).
+    global _surface
+    global _clipSurface
+    global _clipRect
+    global _canvasSurface
+    _makeSureWindowCreated()
+    if _clipRect is not None:
+        _clipSurface.set_clip(None)
+        _canvasSurface.blit(_clipSurface, _clipRect, _clipRect)
+        _surface = _canvasSurface
+        _clipRect = None
+    if x is None:
+        return
+    if (_clipSurface is None) or (_clipSurface.get_size() != _surface.get_size()):
+        _clipSurface = pygame.Surface(_surface.get_size())
+    _canvasSurface = _surface
+    _clipRect = _pixelRect(x, y, w, h, margin)
+    _clipSurface.set_clip(_clipRect)
+    _surface = _clipSurface
+
+def _drawUnclipped(draw, *args):
+    """
+    Call the pygame.draw function draw on the background canvas with
+    args, ignoring its clipping area, as pygame draws the lines and the
+    outlines of rectangles differently on a clipped surface (the
+    scratch surface of setClip() is only copied within the rectangle).
+    """
+    clip = _surface.get_clip()
+    _surface.set_clip(None)
+    draw(_surface, *args)
+    _surface.set_clip(clip)
+
 def save(f):
     """
     Save the window canvas to file f.
@@ -590,8 +771,28 @@ def show(msec=float('inf')):
     _show()
     _checkForEvents()
 
-    # Sleep for the required time, but check for events every
-    # QUANTUM seconds.
+    _wait(msec)
+
+def showRegions(regions, margin=0, msec=0):
+    """
+    Copy only the given regions of the background canvas to the window
+    canvas and update just those parts of the window, and then wait for
+    msec milliseconds. Each region is an (x, y, w, h) rectangle whose
+    lower left point is (x, y), extended by margin pixels on each side.
+    """
+    _makeSureWindowCreated()
+    rects = [_pixelRect(x, y, w, h, margin) for x, y, w, h in regions]
+    for rect in rects:
+        _background.blit(_surface, rect, rect)
+    pygame.display.update(rects)
+    _checkForEvents()
+    _wait(msec)
+
+def _wait(msec):
+    """
+    Wait for msec milliseconds, checking for events every QUANTUM
+    seconds.
+    """
     QUANTUM = .01
     sec = msec / 1000.0
     if sec < QUANTUM:
@@ -669,6 +870,11 @@ def _checkForEvents():
             sys.exit()
         elif event.type == pygame.KEYDOWN:
             _keysTyped = [pygame.key.name(event.key)] + _keysTyped
+            if _keyEventsEnabled:
+                _keyEvents.append((pygame.key.name(event.key), True, time.perf_counter()))
+        elif event.type == pygame.KEYUP:
+            if _keyEventsEnabled:
+                _keyEvents.append((pygame.key.name(event.key), False, time.perf_counter()))
         elif (event.type == pygame.MOUSEBUTTONUP) and \
             (event.button == 3):
             _saveToFile()
@@ -713,6 +919,38 @@ def clearKeysTyped():
     global _keysTyped
     _keysTyped = []
 
+def enableKeyEvents(enable=True):
+    """
+    Start (or stop if enable is False) recording the presses and the
+    releases of the keys as key events, the queue of the key events is
+    emptied.
+    """
+    global _keyEventsEnabled
+    _keyEventsEnabled = enable
+    _keyEvents.clear()
+
+def pollEvents():
+    """
+    Check for the events (such as the keys typed) without waiting.
+    """
+    _checkForEvents()
+
+def hasNextKeyEvent():
+    """
+    Return True if the queue of the key events is not empty. Otherwise
+    return False.
+    """
+    return len(_keyEvents) > 0
+
+def nextKeyEvent():
+    """
+    Remove the first event from the queue of the key events, and return
+    it as (key, pressed, time) where pressed is True for a key press and
+    False for a key release, and time is the time.perf_counter() value
+    when the event was received.
+    """
+    return _keyEvents.popleft()
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
@@ -767,7 +1005,6 @@ def mouseY():
 setXscale()
 setYscale()
 setPenRadius()
-pygame.font.init()
 
 #-----------------------------------------------------------------------
 
@@ -777,6 +1014,8 @@ def _getFileName():
     """
     Display a dialog box that asks the user for a file name.
     """
+    import tkinter as Tkinter
+    import tkinter.filedialog as tkFileDialog
     root = Tkinter.Tk()
     root.withdraw()
     reply = tkFileDialog.asksaveasfilename(initialdir='.')
@@ -788,6 +1027,8 @@ def _confirmFileSave():
     """
     Display a dialog box that confirms a file save operation.
     """
+    import tkinter as Tkinter
+    import tkinter.messagebox as tkMessageBox
     root = Tkinter.Tk()
     root.withdraw()
     tkMessageBox.showinfo(title='File Save Confirmation',
@@ -799,6 +1040,8 @@ def _reportFileSaveError(msg):
     Display a dialog box that reports a msg.  msg is a string which
     describes an error in a file save operation.
     """
+    import tkinter as Tkinter
+    import tkinter.messagebox as tkMessageBox
     root = Tkinter.Tk()
     root.withdraw()
     tkMessageBox.showerror(title='File Save Error', message=msg)
@@ -0,0 +1,84 @@
+import collections
+import random
+
+
+# A class for choosing the types (shapes) of the tetrominoes uniformly at random
+# (each type is equally likely for each tetromino as in the original game). The
+# generators use the given random.Random object (the random module by default),
+# so the sequence of the types is determined by the seed of that object.
+class UniformGenerator:
+    def __init__(self, types, rng=random):
+        self.types = list(types)
+        self.rng = rng
+
+    # A method that returns the type of the next tetromino
+    def next_type(self):
+        return self.rng.choice(self.types)
+
+    # A method that returns the state of the generator apart from its rng
+    # (None as the uniform choices do not depend on the previous types)
+    def get_state(self):
+        return None
+
+    # A method for restoring a state returned by get_state
+    def set_state(self, state):
+        pass
+
+
+# A class for dealing the types from a shuffled bag that holds each type once
+# (an 8-bag for the 8 types of GameEngine), so each type comes once before any
+# repeats
+class BagGenerator(UniformGenerator):
+    def __init__(self, types, rng=random):
+        super().__init__(types, rng)
+        # the types left in the current bag (dealt from the end)
+        self.bag = []
+
+    def next_type(self):
+        if not self.bag:
+            self.bag = list(self.types)
+            self.rng.shuffle(self.bag)
+        return self.bag.pop()
+
+    def get_state(self):
+        return tuple(self.bag)
+
+    def set_state(self, state):
+        self.bag = list(state)
+
+
+# A class for choosing the types at random while avoiding the recent types: a
+# type that is one of the last history_size types is chosen again, up to rolls
+# choices in total (the last choice is kept)
+class HistoryGenerator(UniformGenerator):
+    def __init__(self, types, rng=random, history_size=4, rolls=4):
+        super().__init__(types, rng)
+        self.rolls = rolls
+        self.history = collections.deque(maxlen=history_size)
+
+    def next_type(self):
+        for _ in range(self.rolls):
+            shape = self.rng.choice(self.types)
+            if shape not in self.history:
+                break
+        self.history.append(shape)
+        return shape
+
+    def get_state(self):
+        return tuple(self.history)
+
+    def set_state(self, state):
+        self.history.clear()
+        self.history.extend(state)
+
+
+# the generators that can be chosen by name (e.g. in GameEngine)
+generators = {"uniform": UniformGenerator, "bag": BagGenerator, "history": HistoryGenerator}
+
+
+# A function that creates the generator with the given name for the given types
+def create_generator(name, types, rng=random):
+    if name not in generators:
+        raise ValueError("unknown piece generator '%s' (use one of %s)"
+                         % (name, ", ".join(generators)))
+    return generators[name](types, rng)
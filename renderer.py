@@ -0,0 +1,155 @@
+import numpy as np
+
+import lib.stddraw as stddraw  # used for drawing the game grid
+from board import exponent_to_number, number_to_exponent
+from point import Point  # used for tile positions
+from tile import Tile  # used for drawing the tiles
+
+
+# A class for rendering a game grid frame by frame by repainting only the cells
+# that changed since the last frame. A frame is described by three layers: the
+# exponents of the locked tiles, the exponents of the tiles of the current
+# tetromino and the cells of its landing preview. Comparing the layers with the
+# ones of the last frame finds every changed cell (the old and the new cells of
+# the tetromino as well as the merged, cleared and fallen tiles), and only the
+# rectangles of those cells (and of the score when it changes) are repainted on
+# the canvas and updated in the window.
+class GridRenderer:
+    # the number of pixels around a repainted rectangle that are repainted as
+    # well, as the tile outlines may be drawn slightly over the adjacent cells
+    margin = 3
+
+    def __init__(self, game_grid):
+        self.grid = game_grid
+        # the Tile objects used for drawing the tiles of each exponent
+        self.tiles = {}
+        self.invalidate()
+
+    # A method for making the next frame repaint the whole canvas (e.g. after
+    # something else was drawn on the canvas)
+    def invalidate(self):
+        self.layers = None
+        self.falling_order = []
+        self.score = None
+
+    # A method for rendering the current frame of the game grid and showing it
+    # for pause ms, returns the number of the repainted rectangles (None when
+    # the whole canvas is repainted)
+    def render(self, pause=0):
+        layers = self.get_layers()
+        if self.layers is None or self.layers[0].shape != layers[0].shape:
+            self.grid.display(pause=None)
+            stddraw.show(pause)
+            self.layers, self.score = layers, self.grid.score
+            self.falling_order = self.get_falling_order()
+            return None
+        changed = np.zeros(layers[0].shape, dtype=bool)
+        for layer, last_layer in zip(layers, self.layers):
+            changed |= layer != last_layer
+        # the repainted rectangles as (first column, first row, last column,
+        # last row) blocks of cells, one block for each run of changed cells
+        # in a row
+        blocks = []
+        for row, col in zip(*np.nonzero(changed)):
+            row, col = int(row), int(col)
+            if blocks and blocks[-1][1] == row and blocks[-1][2] == col - 1:
+                blocks[-1] = (blocks[-1][0], row, col, row)
+            else:
+                blocks.append((col, row, col, row))
+        if self.grid.score != self.score:
+            blocks.append(self.get_score_block())
+        self.layers, self.score = layers, self.grid.score
+        self.falling_order = self.get_falling_order()
+        for block in blocks:
+            self.repaint(block)
+        stddraw.showRegions([self.get_block_rectangle(block) for block in blocks],
+                            self.margin, pause)
+        return len(blocks)
+
+    # A method that returns the layers of the current frame: the exponents of
+    # the locked tiles, the exponents of the tiles of the current tetromino and
+    # the cells of its landing preview (only the cells inside the game grid)
+    def get_layers(self):
+        grid = self.grid
+        locked = grid.board.cells.copy()
+        falling = np.zeros_like(locked)
+        ghost = np.zeros(locked.shape, dtype=bool)
+        tetromino = grid.current_tetromino
+        if tetromino is not None:
+            for tile, (x, y) in zip(tetromino.tiles, tetromino.get_tile_positions()):
+                if y < grid.grid_height:
+                    falling[y, x] = number_to_exponent(tile.number)
+            if grid.show_ghost:
+                for x, y in tetromino.get_landing_positions(grid):
+                    if y < grid.grid_height:
+                        ghost[y, x] = True
+        return locked, falling, ghost
+
+    # A method that returns the (x, y) cells of the tiles of the current
+    # tetromino inside the game grid in the order of its tiles
+    def get_falling_order(self):
+        tetromino = self.grid.current_tetromino
+        if tetromino is None:
+            return []
+        return [(x, y) for x, y in tetromino.get_tile_positions()
+                if y < self.grid.grid_height]
+
+    # A method that returns the block of cells under the score text (drawn by
+    # GameGrid.draw_score around the cell in the second column from the right
+    # of the top row)
+    def get_score_block(self):
+        grid = self.grid
+        return (max(grid.grid_width - 5, 0), max(grid.grid_height - 2, 0),
+                grid.grid_width - 1, grid.grid_height - 1)
+
+    # A method that returns the (x, y, w, h) rectangle covered by a block
+    @staticmethod
+    def get_block_rectangle(block):
+        first_col, first_row, last_col, last_row = block
+        return (first_col - 0.5, first_row - 0.5,
+                last_col - first_col + 1, last_row - first_row + 1)
+
+    # A method for repainting a block of cells (and the margin around it) in
+    # the same order as GameGrid.display: the background (the empty cells and
+    # the inner grid lines), the locked tiles, the landing preview, the current
+    # tetromino, the boundaries and the score. Only the cells next to the block can be drawn
+    # over the block, so the others are skipped.
+    def repaint(self, block):
+        grid = self.grid
+        first_col, first_row, last_col, last_row = block
+        stddraw.setClip(*self.get_block_rectangle(block), margin=self.margin)
+        grid.draw_layer("background", grid.draw_background)
+        # the cells next to the block (and in the block)
+        rows = slice(max(first_row - 1, 0), min(last_row + 2, grid.grid_height))
+        cols = slice(max(first_col - 1, 0), min(last_col + 2, grid.grid_width))
+        locked, falling, ghost = self.layers
+        self.draw_tiles(locked, rows, cols)
+        if ghost[rows, cols].any():
+            stddraw.setPenColor(grid.ghost_color)
+            stddraw.setPenRadius(grid.ghost_thickness)
+            for row, col in zip(*np.nonzero(ghost[rows, cols])):
+                stddraw.square(cols.start + col, rows.start + row, 0.45)
+            stddraw.setPenRadius()
+        # the tiles of the tetromino are drawn in the order of Tetromino.draw
+        # as the outline of a tile may be drawn over by the next tile
+        for x, y in self.falling_order:
+            if rows.start <= y < rows.stop and cols.start <= x < cols.stop:
+                self.draw_tile(falling[y, x], x, y)
+        grid.draw_layer("boundaries", grid.draw_boundaries)
+        score_first_col, score_first_row, _, _ = self.get_score_block()
+        if last_col >= score_first_col and last_row >= score_first_row:
+            grid.draw_score()
+        stddraw.setClip()
+
+    # A method for drawing the tiles of a layer in the given rows and columns
+    def draw_tiles(self, layer, rows, cols):
+        for row, col in zip(*np.nonzero(layer[rows, cols])):
+            self.draw_tile(layer[rows.start + row, cols.start + col],
+                           cols.start + col, rows.start + row)
+
+    # A method for drawing a tile with the given exponent in the given cell
+    def draw_tile(self, exponent, x, y):
+        exponent = int(exponent)
+        if exponent not in self.tiles:
+            self.tiles[exponent] = Tile(exponent_to_number(exponent))
+        self.tiles[exponent].draw(Point(x, y))
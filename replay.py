@@ -0,0 +1,248 @@
+################################################################################
+#                                                                              #
+# Replays: the actions of a game recorded in a compact binary format, which    #
+# reproduce the game exactly when they are applied to a GameEngine created     #
+# with the same seed and settings                                              #
+#                                                                              #
+################################################################################
+
+from game_engine import GameEngine  # the class running the game rules
+from piece_generator import generators  # the piece generators that can be chosen by name
+
+# A replay file starts with the magic bytes, the version and the settings of
+# the game as varints (unsigned LEB128: 7 bits per byte, the high bit is set on
+# all the bytes but the last one):
+#   seed, grid height, grid width, generator, flags, fall speed (ms, 0 if none)
+# where generator is the index of the name in generator_names and flags has
+# bit 0 set for the wall kicks and bit 1 set for the "settle" gravity. Each
+# event is then a varint (tick_delta << 3) | code where tick_delta is the number
+# of fall ticks since the previous event and code is the index of the action in
+# action_codes (0 for a key press that is not an action, which still lets the
+# floating tiles fall). The end code is followed by the final score.
+magic = b"T2RP"
+version = 1
+generator_names = tuple(generators)
+# the seeds are stored as unsigned varints (and as uint64 values in the index
+# of a replay corpus), so only the integer seeds in this range are recorded
+max_seed = 2 ** 64 - 1
+action_codes = (None,) + GameEngine.actions
+end_code = 7
+
+
+# A function that appends the varint encoding of a non-negative integer to out
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return out
+
+
+# A function that decodes the varint at the given position of data, returns the
+# value and the position after it (raises EOFError at the end of the data)
+def decode_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        if pos >= len(data):
+            raise EOFError("truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+# A class for the contents of a replay: the settings of the game, the (tick,
+# action) events and the final ticks and score (None when the recording ended
+# before the end marker, e.g. when the game window was closed)
+class Replay:
+    def __init__(self, seed, grid_h=20, grid_w=12, generator="uniform", wall_kicks=False,
+                 gravity="step", fall_speed=0, events=None, final_ticks=None, final_score=None):
+        self.seed = seed
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.generator = generator
+        self.wall_kicks = wall_kicks
+        self.gravity = gravity
+        self.fall_speed = fall_speed
+        self.events = events if events is not None else []
+        self.final_ticks = final_ticks
+        self.final_score = final_score
+
+    # A method that creates the engine for replaying the game
+    def create_engine(self):
+        return GameEngine(self.grid_height, self.grid_width, gravity=self.gravity,
+                          wall_kicks=self.wall_kicks, seed=self.seed,
+                          generator=self.generator)
+
+    # A method that returns the encoded header (the magic bytes and the settings)
+    def encode_header(self):
+        flags = int(self.wall_kicks) | (int(self.gravity == "settle") << 1)
+        out = bytearray(magic)
+        for value in (version, self.seed, self.grid_height, self.grid_width,
+                      generator_names.index(self.generator), flags, self.fall_speed):
+            encode_varint(value, out)
+        return out
+
+    # A method that returns the whole replay encoded as bytes
+    def to_bytes(self):
+        out = self.encode_header()
+        last_tick = 0
+        for tick, action in self.events:
+            encode_varint((tick - last_tick) << 3 | action_codes.index(action), out)
+            last_tick = tick
+        if self.final_ticks is not None:
+            encode_varint((self.final_ticks - last_tick) << 3 | end_code, out)
+            encode_varint(self.final_score, out)
+        return bytes(out)
+
+    # A method that decodes a replay from bytes (a truncated last event is ignored)
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(magic)] != magic:
+            raise ValueError("not a replay (bad magic bytes)")
+        pos = len(magic)
+        header = []
+        for _ in range(7):
+            value, pos = decode_varint(data, pos)
+            header.append(value)
+        file_version, seed, grid_h, grid_w, generator, flags, fall_speed = header
+        if file_version != version:
+            raise ValueError("unsupported replay version %d" % file_version)
+        replay = cls(seed, grid_h, grid_w, generator_names[generator], bool(flags & 1),
+                     "settle" if flags & 2 else "step", fall_speed)
+        tick = 0
+        try:
+            while pos < len(data):
+                value, pos = decode_varint(data, pos)
+                tick += value >> 3
+                code = value & 7
+                if code == end_code:
+                    replay.final_score, pos = decode_varint(data, pos)
+                    replay.final_ticks = tick
+                    break
+                replay.events.append((tick, action_codes[code]))
+        except EOFError:
+            pass
+        return replay
+
+    def save(self, path):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+
+# A class for recording the game of an engine into a binary file while it is
+# played: the header is written when the recorder is created, each action as
+# soon as it is applied and the end marker when the recorder is closed (the
+# file is flushed after each fall tick, so a crash loses at most one tick)
+class ReplayRecorder:
+    def __init__(self, file, engine, fall_speed=0):
+        self.file = file
+        self.engine = engine
+        if engine.generator_name not in generator_names:
+            raise ValueError("unknown piece generator '%s'" % engine.generator_name)
+        if not isinstance(engine.seed, int) or not 0 <= engine.seed <= max_seed:
+            raise ValueError("cannot record a game with the seed %r (use an integer from 0 to 2 ** 64 - 1)"
+                             % (engine.seed,))
+        header = Replay(engine.seed, engine.grid_height, engine.grid_width,
+                        engine.generator_name, engine.wall_kicks, engine.gravity,
+                        int(fall_speed))
+        self.file.write(header.encode_header())
+        self.last_tick = engine.ticks
+        self.closed = False
+        engine.add_action_observer(self.record_action)
+        engine.add_observer(self.flush)
+
+    # A method that creates a recorder writing to the file at the given path
+    @classmethod
+    def open(cls, path, engine, fall_speed=0):
+        return cls(open(path, "wb"), engine, fall_speed)
+
+    # observer of the engine writing each action as an event
+    def record_action(self, engine, action):
+        code = action_codes.index(action) if action in action_codes else 0
+        self.file.write(encode_varint((engine.ticks - self.last_tick) << 3 | code, bytearray()))
+        self.last_tick = engine.ticks
+
+    # observer of the engine flushing the file after each fall tick
+    def flush(self, engine=None):
+        self.file.flush()
+
+    # A method for writing the end marker (the final ticks and score) and
+    # stopping the recording, the file is left open (e.g. for reading the
+    # replay from an io.BytesIO)
+    def finish(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.engine.remove_action_observer(self.record_action)
+        self.engine.remove_observer(self.flush)
+        out = encode_varint((self.engine.ticks - self.last_tick) << 3 | end_code, bytearray())
+        self.file.write(encode_varint(self.engine.score, out))
+
+    # A method for writing the end marker and closing the file
+    def close(self):
+        self.finish()
+        self.file.close()
+
+
+# A class for replaying a game on a new engine one fall tick at a time
+class ReplayPlayer:
+    def __init__(self, replay):
+        self.replay = replay
+        self.engine = replay.create_engine()
+        # the index of the next event to apply
+        self.next_event = 0
+
+    # the replay is done when all the events are applied and the final tick is
+    # reached (or the game is over)
+    @property
+    def done(self):
+        return self.next_event >= len(self.replay.events) and self.ticks_done
+
+    # all the fall ticks are done when the game is over or the final tick is
+    # reached (the last event when the replay has no end marker)
+    @property
+    def ticks_done(self):
+        engine, final_ticks = self.engine, self.replay.final_ticks
+        if final_ticks is None:
+            events = self.replay.events
+            final_ticks = events[-1][0] if events else 0
+        return engine.grid.game_over or engine.ticks >= final_ticks
+
+    # A method that applies the actions recorded before the next fall tick and
+    # then advances the game by one fall tick (the actions recorded after the
+    # end of the game are applied at once)
+    def advance(self):
+        events, engine = self.replay.events, self.engine
+        ticks_done = self.ticks_done
+        while self.next_event < len(events) and (ticks_done or events[self.next_event][0] <= engine.ticks):
+            engine.apply_action(events[self.next_event][1])
+            self.next_event += 1
+        if not self.ticks_done:
+            engine.tick()
+
+    # A method for replaying the rest of the game, returns the engine
+    def play(self):
+        while not self.done:
+            self.advance()
+        return self.engine
+
+
+# A function that replays the game of a replay (or a replay file) headlessly and
+# returns the engine in the final state of the game, raises ValueError when the
+# final score differs from the recorded one
+def play_replay(replay):
+    if not isinstance(replay, Replay):
+        replay = Replay.load(replay)
+    engine = ReplayPlayer(replay).play()
+    if replay.final_score is not None and engine.score != replay.final_score:
+        raise ValueError("the replayed score %d differs from the recorded score %d"
+                         % (engine.score, replay.final_score))
+    return engine
@@ -0,0 +1,47 @@
+import numpy as np
+
+from batch_game_grid import BatchGameGrid
+from game_engine import GameEngine
+from tetromino import Tetromino
+from tile import Tile
+
+
+# A function that puts the current piece of the given board of the batch on the
+# grid of the engine (the pieces are drawn by different random generators)
+def sync_piece(batch, i, engine):
+    shape = batch.tetromino_types[batch.piece_type[i]]
+    tetromino = Tetromino(shape, grid_h=batch.grid_height, grid_w=batch.grid_width)
+    for k in range(len(tetromino.tiles)):
+        tetromino.tiles[k] = Tile(2 ** int(batch.piece_exponents[i, k]))
+    tetromino.bottom_left_cell.x = int(batch.x[i])
+    tetromino.bottom_left_cell.y = int(batch.y[i])
+    engine.grid.current_tetromino = tetromino
+
+
+# the boards, scores and game over flags of the batch match those of separate
+# engines playing the same pieces and actions at every step
+def test_batch_matches_engine():
+    n_boards = 40
+    batch = BatchGameGrid(n_boards, seed=3)
+    engines = [GameEngine(seed=i) for i in range(n_boards)]
+    for i, engine in enumerate(engines):
+        sync_piece(batch, i, engine)
+    rng = np.random.default_rng(0)
+    for step in range(3000):
+        actions = rng.integers(0, len(BatchGameGrid.actions), n_boards)
+        pieces = [engine.grid.current_tetromino for engine in engines]
+        batch.step(actions)
+        for i, engine in enumerate(engines):
+            if engine.done:
+                continue
+            engine.step(BatchGameGrid.actions[actions[i]])
+            if engine.grid.current_tetromino is not pieces[i] and not engine.done:
+                sync_piece(batch, i, engine)
+            assert np.array_equal(engine.grid.board.cells, batch.cells[i]), (step, i)
+            assert engine.score == batch.score[i], (step, i)
+            assert engine.grid.game_over == batch.game_over[i], (step, i)
+        if batch.game_over.all():
+            break
+    # the comparison covers the ends of the games and the doubling of the tiles
+    assert batch.game_over.any()
+    assert batch.doubled.any()
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from board import label_cells, supported_cells
+from game_engine import GameEngine
+from tetromino import Tetromino
+
+
+# the row integers keep all the columns of the grids wider than 63 columns
+@pytest.mark.parametrize("grid_w", [12, 62, 63, 64, 70])
+def test_wide_grid_collisions(grid_w):
+    grid = GameEngine(10, grid_w, seed=0).grid
+    grid.board.set_number(0, grid_w - 1, 2)
+    grid.board.update_indexes()
+    assert grid.bitboard.rows[0] == 1 << (grid_w - 1)
+    assert not Tetromino.can_be_placed('.', 0, grid_w - 1, 0, grid)
+    assert Tetromino.can_be_placed('.', 0, grid_w - 2, 0, grid)
+
+
+# the tiles connected to the bottom row are the ones of the components that
+# have a tile in the bottom row
+@pytest.mark.parametrize("grid_w", [12, 62, 63, 70, 130])
+def test_supported_cells_matches_labels(grid_w):
+    rng = np.random.default_rng(grid_w)
+    for _ in range(20):
+        cells = (rng.random((8, grid_w)) < 0.5).astype(np.uint8)
+        labels = label_cells(cells > 0)
+        bottom_labels = labels[0][labels[0] > 0]
+        expected = np.isin(labels, bottom_labels) & (cells > 0)
+        assert np.array_equal(supported_cells(cells), expected)
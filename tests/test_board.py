@@ -0,0 +1,93 @@
+import random
+
+import numpy as np
+import pytest
+
+from game_grid import GameGrid
+
+
+# A minimal tile with a number as used by the reference implementation
+class ReferenceTile:
+    def __init__(self, number):
+        self.number = number
+
+
+# A copy of the object-loop merge_tiles and update_score of GameGrid before the
+# merge pass was vectorized (the tiles are stored in a matrix of objects)
+class ReferenceGrid:
+    def __init__(self, numbers, score):
+        self.grid_height, self.grid_width = numbers.shape
+        self.tile_matrix = [[ReferenceTile(int(number)) if number else None for number in row]
+                            for row in numbers]
+        self.score = score
+        self.doubled = score >= 200
+        self.quadrupled = score >= 16000
+
+    def update_score(self, points):
+        self.score += points
+        if self.score >= 200 and not self.doubled:
+            self.double_tiles_value()
+            self.doubled = True
+        elif self.score >= 16000 and not self.quadrupled:
+            self.double_tiles_value()
+            self.quadrupled = True
+
+    def double_tiles_value(self):
+        for row in range(self.grid_height):
+            for col in range(self.grid_width):
+                if self.tile_matrix[row][col] is not None:
+                    self.tile_matrix[row][col].number *= 2
+
+    def merge_tiles(self):
+        for col in range(self.grid_width):
+            row = 0
+            while row < self.grid_height - 1:
+                current_tile = self.tile_matrix[row][col]
+                above_tile = self.tile_matrix[row + 1][col]
+                if current_tile is not None and above_tile is not None:
+                    if current_tile.number == above_tile.number:
+                        merged_number = current_tile.number * 2
+                        current_tile.number = merged_number
+                        self.tile_matrix[row + 1][col] = None
+                        self.update_score(merged_number)
+                        for r in range(row + 1, self.grid_height - 1):
+                            self.tile_matrix[r][col] = self.tile_matrix[r + 1][col]
+                        self.tile_matrix[self.grid_height - 1][col] = None
+                row += 1
+
+    def to_numbers(self):
+        return np.array([[tile.number if tile is not None else 0 for tile in row]
+                         for row in self.tile_matrix])
+
+
+# A function that creates a random board of small numbers (with many equal
+# neighbours) where each cell is empty with the given probability
+def random_numbers(rng, grid_h, grid_w, empty=0.3):
+    numbers = np.zeros((grid_h, grid_w), dtype=np.int64)
+    for row in range(grid_h):
+        for col in range(grid_w):
+            if rng.random() >= empty:
+                numbers[row, col] = 2 ** rng.randint(1, 4)
+    return numbers
+
+
+# the starting scores include the scores just under the doubling thresholds
+@pytest.mark.parametrize("score", [0, 150, 190, 198, 15900, 15990, 15998, 20000])
+def test_merge_tiles_matches_reference(score):
+    rng = random.Random(score)
+    for _ in range(200):
+        grid_h, grid_w = rng.randint(2, 20), rng.randint(1, 12)
+        numbers = random_numbers(rng, grid_h, grid_w, rng.choice([0.0, 0.2, 0.5]))
+        reference = ReferenceGrid(numbers, score)
+        grid = GameGrid(grid_h, grid_w)
+        for (row, col), number in np.ndenumerate(numbers):
+            if number:
+                grid.board.set_number(row, col, int(number))
+        grid.score, grid.doubled, grid.quadrupled = score, reference.doubled, reference.quadrupled
+
+        reference.merge_tiles()
+        grid.merge_tiles()
+
+        assert np.array_equal(grid.board.to_numbers(), reference.to_numbers())
+        assert grid.score == reference.score
+        assert (grid.doubled, grid.quadrupled) == (reference.doubled, reference.quadrupled)
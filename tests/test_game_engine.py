@@ -0,0 +1,32 @@
+import numpy as np
+
+from game_engine import GameEngine
+
+
+# A function that advances the engine by one hard drop and returns the type
+# and the horizontal spawn position of the dropped tetromino
+def drop(engine):
+    tetromino = engine.grid.current_tetromino
+    assert 0 <= tetromino.bottom_left_cell.x <= engine.grid_width - tetromino.n
+    engine.step("s")
+    return tetromino.type, tetromino.bottom_left_cell.x
+
+
+# the engines of different grid sizes in a process do not share the grid size
+# of their tetrominoes, so a game only depends on its own seed and settings
+def test_engines_of_different_sizes_are_independent():
+    alone = GameEngine(20, 12, seed=1)
+    alone_spawns = [drop(alone) for _ in range(200) if not alone.done]
+
+    small = GameEngine(20, 12, seed=1)
+    wide = GameEngine(10, 40, seed=2)
+    small_spawns = []
+    for _ in range(200):
+        if not small.done:
+            small_spawns.append(drop(small))
+        if not wide.done:
+            drop(wide)
+
+    assert small_spawns == alone_spawns
+    assert np.array_equal(small.grid.board.cells, alone.grid.board.cells)
+    assert small.score == alone.score
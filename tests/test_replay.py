@@ -0,0 +1,73 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+from game_engine import GameEngine
+from replay import Replay, ReplayRecorder, play_replay
+
+# the actions pressed in the recorded games ("p" and "g" are not game actions
+# but still let the floating tiles fall, so they are recorded too)
+keys = list(GameEngine.actions) + ["p", "g"]
+
+
+# A function that plays a random game recorded by a ReplayRecorder and returns
+# the engine and the encoded replay
+def record_game(seed, generator, wall_kicks=False, gravity="step", max_ticks=1000):
+    engine = GameEngine(seed=seed, generator=generator, wall_kicks=wall_kicks, gravity=gravity)
+    recorder = ReplayRecorder(io.BytesIO(), engine, fall_speed=250)
+    rng = random.Random(seed)
+    while not engine.done and engine.ticks < max_ticks:
+        for _ in range(rng.randrange(4)):
+            engine.apply_action(rng.choice(keys))
+        engine.tick()
+    recorder.finish()
+    return engine, recorder.file.getvalue()
+
+
+@pytest.mark.parametrize("generator", ["uniform", "bag", "history"])
+def test_replay_reproduces_game(generator):
+    for seed in range(5):
+        engine, data = record_game(seed, generator, wall_kicks=seed % 2 == 1,
+                                   gravity="settle" if seed == 4 else "step")
+        replay = Replay.from_bytes(data)
+        assert replay.to_bytes() == data
+        assert (replay.seed, replay.generator, replay.fall_speed) == (seed, generator, 250)
+        assert (replay.final_ticks, replay.final_score) == (engine.ticks, engine.score)
+
+        replayed = play_replay(replay)
+        assert (replayed.score, replayed.ticks) == (engine.score, engine.ticks)
+        assert np.array_equal(replayed.grid.board.cells, engine.grid.board.cells)
+
+
+# a replay cut off before the end marker (e.g. when the window was closed) is
+# replayed up to its last event
+def test_truncated_replay():
+    engine = GameEngine(seed=7, generator="bag")
+    recorder = ReplayRecorder(io.BytesIO(), engine)
+    # the state of the game after each action
+    states = []
+    engine.add_action_observer(lambda engine, action: states.append(
+        (engine.ticks, engine.score, engine.grid.board.cells.copy())))
+    rng = random.Random(7)
+    while not engine.done and engine.ticks < 300:
+        for _ in range(rng.randrange(3)):
+            engine.apply_action(rng.choice(keys))
+        engine.tick()
+    recorder.flush()
+    truncated = recorder.file.getvalue()
+    recorder.finish()
+    assert recorder.file.getvalue().startswith(truncated)
+
+    replay = Replay.from_bytes(truncated)
+    assert replay.final_ticks is None and replay.final_score is None
+    assert len(replay.events) == len(states)
+    assert replay.to_bytes() == truncated
+    # a partial varint at the end is ignored
+    assert Replay.from_bytes(truncated + bytes([0x80])).events == replay.events
+
+    ticks, score, cells = states[-1]
+    replayed = play_replay(replay)
+    assert (replayed.ticks, replayed.score) == (ticks, score)
+    assert np.array_equal(replayed.grid.board.cells, cells)
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from board import Board
+from game_engine import GameEngine
+
+actions = list(GameEngine.actions) + [None]
+
+
+# A function that returns the state of the game compared after the restores
+def game_state(engine):
+    grid = engine.grid
+    tetromino = grid.current_tetromino
+    return (grid.board.cells.tobytes(), grid.score, grid.lines_cleared, grid.doubled,
+            grid.quadrupled, grid.game_over, engine.ticks,
+            tetromino.get_state() if tetromino is not None else None)
+
+
+# A function that checks that the indexes of the board equal the ones computed
+# again from its cells
+def check_indexes(board):
+    computed = Board.from_exponents(board.cells)
+    assert np.array_equal(board.column_heights, computed.column_heights)
+    assert np.array_equal(board.row_fill_counts, computed.row_fill_counts)
+    assert board.bitboard.rows == computed.bitboard.rows
+
+
+@pytest.mark.parametrize("generator", ["uniform", "bag", "history"])
+def test_restore_replays_the_same_game(generator):
+    engine = GameEngine(seed=11, generator=generator)
+    rng = random.Random(11)
+    for _ in range(150):
+        engine.step(rng.choice(actions))
+    snapshot = engine.snapshot()
+    start = game_state(engine)
+    branch = [rng.choice(actions) for _ in range(300)]
+
+    outcomes = []
+    for _ in range(3):
+        engine.restore(snapshot)
+        assert game_state(engine) == start
+        check_indexes(engine.grid.board)
+        for action in branch:
+            if engine.done:
+                break
+            engine.step(action)
+        check_indexes(engine.grid.board)
+        outcomes.append(game_state(engine))
+        # play differently before the next restore
+        for _ in range(20):
+            engine.step(rng.choice(actions))
+    assert outcomes[0] == outcomes[1] == outcomes[2]
+    assert outcomes[0] != start
+
+
+# the indexes restored from a snapshot are the ones of the snapshot board (and
+# not the ones of the board at the time of the restore)
+def test_restore_indexes():
+    engine = GameEngine(seed=3)
+    rng = random.Random(3)
+    snapshots = []
+    for _ in range(400):
+        if engine.done:
+            break
+        engine.step(rng.choice(actions))
+        snapshots.append(engine.snapshot())
+    for snapshot in reversed(snapshots[::7]):
+        engine.restore(snapshot)
+        check_indexes(engine.grid.board)
@@ -1,92 +1,96 @@
 from tile import Tile
 from point import Point
+from bitboard import build_row_masks
 import copy as cp
 import numpy as np
 import random
 class Tetromino:
-   # the dimensions of the game grid (defined as class variables)
+   # the default dimensions of the game grid (defined as class variables and
+   # used when a tetromino is created without the dimensions of its grid)
    grid_height, grid_width = None, None
    tetromino_types = ['I', 'O', 'Z', 'S', 'L', 'J', 'T']
+   # the occupied (non-empty) cells in the tile matrix of each shape in its
+   # initial rotation state as (n, [(column_index, row_index), ...]) where
+   # n = number of rows = number of columns in the tile matrix
+   # (see the documentation given with this code)
+   shapes = {
+      'I': (4, [(1, 0), (1, 1), (1, 2), (1, 3)]),
+      '.': (1, [(0, 0)]),
+      'O': (2, [(0, 0), (1, 0), (0, 1), (1, 1)]),
+      'Z': (3, [(0, 1), (1, 1), (1, 2), (2, 2)]),
+      'J': (3, [(0, 0), (0, 1), (1, 1), (2, 1)]),
+      'L': (3, [(2, 0), (0, 1), (1, 1), (2, 1)]),
+      'S': (3, [(1, 0), (2, 0), (0, 1), (1, 1)]),
+      'T': (3, [(1, 0), (0, 1), (1, 1), (2, 1)]),
+   }
 
-   # A constructor for creating a tetromino with a given shape (type)
-   def __init__(self, shape):
+   # A constructor for creating a tetromino with a given shape (type) for a
+   # game grid with the given dimensions, the random numbers are drawn from rng
+   # (a random.Random object of the game or the random module)
+   def __init__(self, shape, rng=random, grid_h=None, grid_w=None):
       self.type = shape  # set the type of this tetromino
+      # the dimensions of the game grid of this tetromino (each game engine
+      # passes its own, so the engines in a process are independent)
+      self.grid_height = grid_h if grid_h is not None else Tetromino.grid_height
+      self.grid_width = grid_w if grid_w is not None else Tetromino.grid_width
       # determine the occupied (non-empty) cells in the tile matrix based on
-      # the shape of this tetromino (see the documentation given with this code)
-      occupied_cells = []
-      if self.type == 'I':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino I in its initial rotation state
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((1, 3))
-      elif self.type == '.':
-         n = 1  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino O in its initial rotation state
-         occupied_cells.append((0, 0))  # (column_index, row_index)
-
-
-      elif self.type == 'O':
-         n = 2  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino O in its initial rotation state
-         occupied_cells.append((0, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-      elif self.type == 'Z':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in its initial rotation state
-         occupied_cells.append((0, 1))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((2, 2))
-      elif self.type == 'J':
-         n = 3
-         # shape of the tetromino J in its initial rotation state
-         occupied_cells.append((0, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      elif self.type == 'L':
-         n = 3
-         # shape of the tetromino L in its initial rotation state
-         occupied_cells.append((2, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      elif self.type == 'S':
-         n = 3
-         # shape of the tetromino S in its initial rotation state
-         occupied_cells.append((1, 0))
-         occupied_cells.append((2, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-      elif self.type == 'T':
-         n = 3
-         # shape of the tetromino T in its initial rotation state
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      # create a matrix of numbered tiles based on the shape of this tetromino
-      self.tile_matrix = np.full((n, n), None)
-      # create the four tiles (minos) of this tetromino and place these tiles
-      # into the tile matrix
+      # the shape of this tetromino
+      n, occupied_cells = Tetromino.shapes[self.type]
+      self.n = n  # n = number of rows = number of columns in the tile matrix
+      # the rotation state (the number of clockwise rotations) of this tetromino
+      self.rotation = 0
+      # create the four tiles (minos) of this tetromino in the order of the
+      # occupied cells (the rotation tables give the position of each tile)
+      self.tiles = []
       for col_index, row_index in occupied_cells:
          # Assign a random number (2 or 4) to each tile in the tetromino
-         self.tile_matrix[row_index][col_index] = Tile(random.choice([2, 4]))
+         self.tiles.append(Tile(rng.choice([2, 4])))
 
       # initialize the position of this tetromino (as the bottom left cell in
       # the tile matrix) with a random horizontal position above the game grid
       self.bottom_left_cell = Point()
-      self.bottom_left_cell.y = Tetromino.grid_height - 1
-      self.bottom_left_cell.x = random.randint(0, Tetromino.grid_width - n)
+      self.bottom_left_cell.y = self.grid_height - 1
+      self.bottom_left_cell.x = rng.randint(0, self.grid_width - n)
 
+   # A method that returns the state of this tetromino as a tuple
+   # (type, rotation, x, y, numbers of the tiles)
+   def get_state(self):
+      return (self.type, self.rotation, self.bottom_left_cell.x,
+              self.bottom_left_cell.y, tuple(tile.number for tile in self.tiles))
+
+   # A method that creates a tetromino for a game grid with the given
+   # dimensions from a state returned by get_state (no random numbers are drawn)
+   @classmethod
+   def from_state(cls, state, grid_h=None, grid_w=None):
+      shape, rotation, x, y, numbers = state
+      tetromino = cls.__new__(cls)
+      tetromino.type = shape
+      tetromino.grid_height = grid_h if grid_h is not None else Tetromino.grid_height
+      tetromino.grid_width = grid_w if grid_w is not None else Tetromino.grid_width
+      tetromino.n = Tetromino.shapes[shape][0]
+      tetromino.rotation = rotation
+      tetromino.tiles = [Tile(number) for number in numbers]
+      tetromino.bottom_left_cell = Point(x, y)
+      return tetromino
+
+   # the (dx, dy) offsets of the tiles from the bottom left cell of the tile
+   # matrix in the current rotation state (in the order of self.tiles)
+   @property
+   def offsets(self):
+      return Tetromino.rotation_offsets[self.type][self.rotation]
+
+   # the n x n matrix of the tiles of this tetromino in the current rotation
+   # state (None for the empty cells), created each time it is accessed
+   @property
+   def tile_matrix(self):
+      tile_matrix = np.full((self.n, self.n), None)
+      for tile, (dx, dy) in zip(self.tiles, self.offsets):
+         tile_matrix[self.n - 1 - dy][dx] = tile
+      return tile_matrix
 
    # matrix specified by the given row and column indexes
    def get_cell_position(self, row, col):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
+      n = self.n  # n = number of rows = number of columns
       position = Point()
       # horizontal position of the cell
       position.x = self.bottom_left_cell.x + col
@@ -94,30 +98,22 @@ class Tetromino:
       position.y = self.bottom_left_cell.y + (n - 1) - row
       return position
 
+   # A method that returns the (x, y) positions of the tiles on the game grid
+   def get_tile_positions(self):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      return [(x + dx, y + dy) for dx, dy in self.offsets]
 
    def get_min_bounded_tile_matrix(self, return_position=False):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # determine rows and columns to copy (omit empty rows and columns)
-      min_row, max_row, min_col, max_col = n - 1, 0, n - 1, 0
-      for row in range(n):
-         for col in range(n):
-            if self.tile_matrix[row][col] is not None:
-               if row < min_row:
-                  min_row = row
-               if row > max_row:
-                  max_row = row
-               if col < min_col:
-                  min_col = col
-               if col > max_col:
-                  max_col = col
-      # copy the tiles from the tile matrix of this tetromino
-      copy = np.full((max_row - min_row + 1, max_col - min_col + 1), None)
-      for row in range(min_row, max_row + 1):
-         for col in range(min_col, max_col + 1):
-            if self.tile_matrix[row][col] is not None:
-               row_ind = row - min_row
-               col_ind = col - min_col
-               copy[row_ind][col_ind] = cp.deepcopy(self.tile_matrix[row][col])
+      offsets = self.offsets
+      # determine the bounding box of the tiles (omit empty rows and columns)
+      min_dx = min(dx for dx, dy in offsets)
+      max_dx = max(dx for dx, dy in offsets)
+      min_dy = min(dy for dx, dy in offsets)
+      max_dy = max(dy for dx, dy in offsets)
+      # copy the tiles of this tetromino (row 0 is the top row of the copy)
+      copy = np.full((max_dy - min_dy + 1, max_dx - min_dx + 1), None)
+      for tile, (dx, dy) in zip(self.tiles, offsets):
+         copy[max_dy - dy][dx - min_dx] = Tile(tile.number)
       # return just the matrix copy when return_position is not set (as True)
       # the argument return_position defaults to False when a value is not given
       if not return_position:
@@ -125,20 +121,14 @@ class Tetromino:
       # otherwise return the position of the bottom left cell in copy as well
       else:
          blc_position = cp.copy(self.bottom_left_cell)
-         blc_position.translate(min_col, (n - 1) - max_row)
+         blc_position.translate(min_dx, min_dy)
          return copy, blc_position
 
    def draw(self):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      for row in range(n):
-         for col in range(n):
-            # draw each occupied cell as a tile on the game grid
-            if self.tile_matrix[row][col] is not None:
-               # get the position of the tile
-               position = self.get_cell_position(row, col)
-               # draw only the tiles that are inside the game grid
-               if position.y < Tetromino.grid_height:
-                  self.tile_matrix[row][col].draw(position)
+      for tile, (x, y) in zip(self.tiles, self.get_tile_positions()):
+         # draw only the tiles that are inside the game grid
+         if y < self.grid_height:
+            tile.draw(Point(x, y))
 
    def move(self, direction, game_grid):
       # check if this tetromino can be moved in the given direction by using
@@ -154,46 +144,130 @@ class Tetromino:
          self.bottom_left_cell.y -= 1
       return True  # a successful move in the given direction
 
-   def rotate(self, game_grid):
+   # A method that returns how many rows this tetromino can move down. The
+   # lowest tile of each column of the tetromino is compared with the height of
+   # that column on the grid, the column is only scanned when the tile is below
+   # the top-most locked tile of the column (e.g. under an overhang).
+   def get_drop_distance(self, game_grid):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      heights = game_grid.column_heights
+      distance = None
+      for dx, dy in Tetromino.column_bottoms[self.type][self.rotation]:
+         col, row = x + dx, y + dy
+         if row >= heights[col]:
+            free_rows = row - heights[col]
+         else:
+            free_rows = 0
+            while row - free_rows - 1 >= 0 and not game_grid.is_occupied(row - free_rows - 1, col):
+               free_rows += 1
+         if distance is None or free_rows < distance:
+            distance = free_rows
+      return distance
+
+   # A method that returns the (x, y) positions of the tiles on the game grid
+   # after a hard drop (used for drawing the landing preview)
+   def get_landing_positions(self, game_grid):
+      distance = self.get_drop_distance(game_grid)
+      return [(x, y - distance) for x, y in self.get_tile_positions()]
+
+   # A method for moving this tetromino down as far as possible (hard drop),
+   # returns whether it was moved
+   def hard_drop(self, game_grid):
+      distance = self.get_drop_distance(game_grid)
+      self.bottom_left_cell.y -= distance
+      return distance > 0
+
+   # A method for rotating this tetromino clockwise. When wall_kicks is True,
+   # the (dx, dy) shifts of the SRS kick table are tried in order when the
+   # rotated tetromino does not fit in place.
+   def rotate(self, game_grid, wall_kicks=False):
       if self.type == 'O':
          return False
-      self.tile_matrix = np.rot90(self.tile_matrix, -1)
+      new_rotation = (self.rotation + 1) % 4
+      kicks = Tetromino.get_wall_kicks(self.type, self.rotation) if wall_kicks else ((0, 0),)
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      for kick_x, kick_y in kicks:
+         if self.can_be_placed(self.type, new_rotation, x + kick_x, y + kick_y, game_grid):
+            # rotate the tile matrix clockwise by switching to the next offsets
+            self.rotation = new_rotation
+            self.bottom_left_cell.translate(kick_x, kick_y)
+            return True
+      return False
 
-      if not self.can_be_moved("rotate", game_grid):
-         self.tile_matrix = np.rot90(self.tile_matrix, 1)
-         return False
+   # method for checking if this tetromino can be moved in a given direction
+   # ("left", "right", "down" or "rotate" for a clockwise rotation in place)
+   def can_be_moved(self, direction, game_grid):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      if direction == "rotate":
+         new_rotation = (self.rotation + 1) % 4
+         return self.can_be_placed(self.type, new_rotation, x, y, game_grid)
+      move_x, move_y = Tetromino.directions[direction]
+      return self.can_be_placed(self.type, self.rotation, x + move_x, y + move_y, game_grid)
 
+   # method for checking if a tetromino of the given shape and rotation state
+   # fits on the grid for the given bottom left cell (the tiles may be above the
+   # game grid, but not outside its other sides or on the locked tiles)
+   @staticmethod
+   def can_be_placed(shape, rotation, x, y, game_grid):
+      # use the row masks of the shape when the grid has a bitboard
+      bitboard = getattr(game_grid, "bitboard", None)
+      if bitboard is not None:
+         return bitboard.fits(Tetromino.row_masks[shape][rotation], x, y)
+      for dx, dy in Tetromino.rotation_offsets[shape][rotation]:
+         new_x, new_y = x + dx, y + dy
+         # check the left, right and lower boundaries and the locked tiles
+         if new_x < 0 or new_x >= game_grid.grid_width or new_y < 0 or game_grid.is_occupied(new_y, new_x):
+            return False
+      # if none of the checks above failed, the tiles fit on the grid
       return True
 
-   # method for checking if this tetromino can be moved in a given direction
-   # method for checking if this tetromino can be moved in a given direction
-   def can_be_moved(self, direction, game_grid):
-       n = len(self.tile_matrix)  # n = number of rows = number of columns
-       for row in range(n):
-           for col in range(n):
-               # if the cell is not empty (there is a tile)
-               if self.tile_matrix[row][col] is not None:
-                   # calculate the position of the cell on the grid
-                   pos = self.get_cell_position(row, col)
-                   # check for the left boundary
-                   if direction == "left" and (pos.x - 1 < 0 or game_grid.is_occupied(pos.y, pos.x - 1)):
-                       return False
-                   # check for the right boundary
-                   if direction == "right" and (
-                           pos.x + 1 >= game_grid.grid_width or game_grid.is_occupied(pos.y, pos.x + 1)):
-                       return False
-                   # check for the lower boundary
-                   if direction == "down" and (pos.y - 1 < 0 or game_grid.is_occupied(pos.y - 1, pos.x)):
-                       return False
-                   # for rotation, we need to check every tile of the tetromino
-                   if direction == "rotate":
-                       for rot_row in range(n):
-                           for rot_col in range(n):
-                               # calculate the new position after rotation
-                               new_pos = self.get_cell_position(rot_row, rot_col)
-                               # check if the new position is inside the grid and not occupied
-                               if not game_grid.is_inside(new_pos.y, new_pos.x) or game_grid.is_occupied(new_pos.y,
-                                                                                                         new_pos.x):
-                                   return False
-       # if none of the checks above failed, the tetromino can be moved/rotated
-       return True
+   # A method that returns the SRS wall kicks (dx, dy) tried for a clockwise
+   # rotation of the given shape from the given rotation state
+   @staticmethod
+   def get_wall_kicks(shape, rotation):
+      table = Tetromino.wall_kicks['I' if shape == 'I' else 'JLSTZ']
+      return table[rotation]
+
+
+# A function that builds the rotation table of each shape: the (dx, dy) offsets
+# of its tiles from the bottom left cell of the tile matrix (dy = n - 1 - row)
+# for each of the four rotation states, in the order of the occupied cells
+def build_rotation_offsets(shapes):
+   rotation_offsets = {}
+   for shape, (n, occupied_cells) in shapes.items():
+      cells = [(row, col) for col, row in occupied_cells]
+      rotations = []
+      for rotation in range(4):
+         rotations.append(tuple((col, n - 1 - row) for row, col in cells))
+         # rotate the tile matrix clockwise as np.rot90(tile_matrix, -1)
+         cells = [(col, n - 1 - row) for row, col in cells]
+      rotation_offsets[shape] = tuple(rotations)
+   return rotation_offsets
+
+
+# the tables are built once when this module is imported
+Tetromino.rotation_offsets = build_rotation_offsets(Tetromino.shapes)
+# the row masks of each shape for each rotation state (for bitboard checks)
+Tetromino.row_masks = build_row_masks(Tetromino.rotation_offsets)
+# the (dx, min_dy) offsets of the lowest tile in each column of each shape for
+# each rotation state (used for finding the landing position of a hard drop)
+Tetromino.column_bottoms = {
+   shape: tuple(tuple((dx, min(oy for ox, oy in offsets if ox == dx))
+                      for dx in sorted({ox for ox, oy in offsets}))
+                for offsets in rotations)
+   for shape, rotations in Tetromino.rotation_offsets.items()}
+# the (dx, dy) change of the bottom left cell for each move direction
+Tetromino.directions = {"left": (-1, 0), "right": (1, 0), "down": (0, -1)}
+# the SRS wall kick tables: the (dx, dy) shifts tried in order for a clockwise
+# rotation from each rotation state (0 -> 1, 1 -> 2, 2 -> 3, 3 -> 0), the I
+# tetromino has its own table and the other shapes share the JLSTZ table
+Tetromino.wall_kicks = {
+   'JLSTZ': (((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+             ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+             ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+             ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2))),
+   'I': (((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+         ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+         ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+         ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1))),
+}
@@ -3,6 +3,8 @@ from lib.color import Color  # used for coloring the tiles
 
 
 class Tile:
+    # the tiles only store their number and their (shared) colors
+    __slots__ = ("_number", "background_color", "foreground_color")
     boundary_thickness = 0.004
     font_family, font_size = "Arial", 14
     number_to_color = {
@@ -18,6 +20,17 @@ class Tile:
         1024: Color(195, 32, 32), # Deep red for 1024
         2048: Color(175, 22, 22), # Firebrick for 2048
     }
+    # the colors shared by all the tiles
+    default_color = Color(205, 193, 180)  # Default color for unspecified numbers
+    light_text_color = Color(249, 246, 242)  # Lighter color for text on dark backgrounds
+    dark_text_color = Color(119, 110, 101)  # Darker color for text on light backgrounds
+    box_color = Color(187, 173, 160)  # The box color is a constant
+    # the pre-rendered pictures of the tiles keyed by (number, size in pixels),
+    # created when a tile is first drawn with that number and size (e.g. after
+    # the canvas is resized), at most max_sprites pictures are kept
+    sprites = {}
+    max_sprites = 256
+
     def __init__(self, number):
         self._number = number
         self.update_colors()
@@ -32,29 +45,54 @@ class Tile:
         self.update_colors()  # Update colors whenever the number changes
 
     def update_colors(self):
-        if self.number in self.number_to_color:
-            self.background_color = self.number_to_color[self.number]
-        else:
-            self.background_color = Color(205, 193, 180)  # Default color for unspecified numbers
+        # Look up the shared colors of the number (no colors are created)
+        self.background_color, self.foreground_color = Tile.get_colors(self.number)
 
+    # A method that returns the (background, foreground) colors of a number from
+    # the palette (the table of the colors of each exponent)
+    @staticmethod
+    def get_colors(number):
+        exponent = int(number).bit_length() - 1
+        if 0 <= exponent < len(Tile.palette) and number == 1 << exponent:
+            return Tile.palette[exponent]
+        return Tile.compute_colors(number)
+
+    # A method that computes the (background, foreground) colors of a number
+    @staticmethod
+    def compute_colors(number):
+        background_color = Tile.number_to_color.get(number, Tile.default_color)
         # Set the foreground color based on the number for readability
-        if self.number > 4:
-            self.foreground_color = Color(249, 246, 242)  # Lighter color for text on dark backgrounds
+        if number > 4:
+            foreground_color = Tile.light_text_color
         else:
-            self.foreground_color = Color(119, 110, 101)  # Darker color for text on light backgrounds
-
-        # Set the box color as a constant
-        self.box_color = Color(187, 173, 160)
+            foreground_color = Tile.dark_text_color
+        return background_color, foreground_color
 
     def draw(self, position, length=1):
+        # Draw the pre-rendered picture of the tile (one blit per tile)
+        key = (self.number, stddraw.pixelSize(length, length))
+        sprite = Tile.sprites.get(key)
+        if sprite is None:
+            if len(Tile.sprites) >= Tile.max_sprites:
+                Tile.sprites.clear()
+            sprite = stddraw.createSprite(length, length, lambda x, y: self.draw_shapes(x, y, length))
+            Tile.sprites[key] = sprite
+        stddraw.drawSprite(sprite, position.x, position.y)
+
+    def draw_shapes(self, x, y, length=1):
         # Draw the tile with the specified colors and text
         stddraw.setPenColor(self.background_color)
-        stddraw.filledSquare(position.x, position.y, length / 2)
+        stddraw.filledSquare(x, y, length / 2)
         stddraw.setPenColor(self.box_color)
         stddraw.setPenRadius(Tile.boundary_thickness)
-        stddraw.square(position.x, position.y, length / 2)
+        stddraw.square(x, y, length / 2)
         stddraw.setPenRadius()  # Reset the pen radius to default
         stddraw.setPenColor(self.foreground_color)
         stddraw.setFontFamily(self.font_family)
         stddraw.setFontSize(self.font_size)
-        stddraw.text(position.x, position.y, str(self.number))
+        stddraw.text(x, y, str(self.number))
+
+
+# the palette is built once when this module is imported (for the numbers up to
+# 2 ** 31, far beyond 2048 as the tile values are doubled with the score)
+Tile.palette = tuple(Tile.compute_colors(1 << exponent) for exponent in range(32))
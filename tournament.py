@@ -0,0 +1,174 @@
+################################################################################
+#                                                                              #
+# Tournament runner: plays many headless games of an agent in parallel         #
+#                                                                              #
+# usage: python tournament.py --agent random --games 1000 --workers 8          #
+#                                                                              #
+################################################################################
+
+import argparse  # used for parsing the command-line arguments
+import importlib  # used for loading the agents given as module:function
+import io
+import json
+import multiprocessing  # used for running the games on all the cores
+import random
+import statistics
+import time
+
+from game_engine import GameEngine  # the class running the game rules
+from piece_generator import generators  # the names of the piece generators
+from replay import ReplayRecorder, max_seed  # used for recording the games
+from corpus import ReplayCorpus  # used for storing the recorded games
+
+
+# An agent is created by a factory function called with a random.Random object
+# (seeded for each game, separately from the game) and is called as agent(observation, engine) after
+# each step, returning the next action (a key name of GameEngine.actions or None)
+
+# an agent that presses a random key (or no key) at each step
+def random_agent(rng):
+    choices = GameEngine.actions + (None,)
+    return lambda observation, engine: rng.choice(choices)
+
+
+# an agent that moves each tetromino to a random column and drops it
+def drop_agent(rng):
+    state = {"tetromino": None, "column": 0}
+
+    def act(observation, engine):
+        tetromino = engine.current_tetromino
+        # choose a column for each new tetromino
+        if tetromino is not state["tetromino"]:
+            state["tetromino"] = tetromino
+            state["column"] = rng.randint(0, engine.grid_width - 1)
+        x = tetromino.bottom_left_cell.x
+        if x < state["column"] and tetromino.can_be_moved("right", engine.grid):
+            return "right"
+        if x > state["column"] and tetromino.can_be_moved("left", engine.grid):
+            return "left"
+        return "s"
+    return act
+
+
+# the agents that can be given by name on the command line
+agents = {"random": random_agent, "drop": drop_agent}
+
+
+# A function that returns the agent factory for a name of the agents dict or
+# for a "module:function" specification
+def load_agent(spec):
+    if spec in agents:
+        return agents[spec]
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError("unknown agent '%s' (use one of %s or module:function)"
+                         % (spec, ", ".join(agents)))
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+# A function that plays one game and returns its statistics (runs in a worker)
+def play_game(task):
+    agent_spec, seed, grid_h, grid_w, max_ticks, generator, record = task
+    # the tetrominoes are created by the random number generator of the engine
+    # and the agent gets its own one, so a game only depends on its seed
+    agent = load_agent(agent_spec)(random.Random("agent:%d" % seed))
+    engine = GameEngine(grid_h, grid_w, seed=seed, generator=generator)
+    # when record is True, the replay of the game is returned in the result
+    recorder = ReplayRecorder(io.BytesIO(), engine) if record else None
+    observation = engine.observe()
+    start_time = time.perf_counter()
+    while not engine.done and engine.ticks < max_ticks:
+        observation = engine.step(agent(observation, engine))[0]
+    result = {
+        "seed": seed,
+        "score": engine.score,
+        "lines_cleared": engine.grid.lines_cleared,
+        "max_tile": engine.grid.board.max_number(),
+        "ticks": engine.ticks,
+        "seconds": time.perf_counter() - start_time,
+    }
+    if recorder is not None:
+        recorder.finish()
+        result["replay"] = recorder.file.getvalue()
+    return result
+
+
+# A function that plays the given number of games of an agent on a pool of
+# worker processes and returns the statistics of all the games (with the
+# encoded replay of each game in its "replay" entry when record is True)
+def run_tournament(agent_spec, games, workers=None, seed=0, grid_h=20, grid_w=12,
+                   max_ticks=100000, generator="uniform", record=False):
+    load_agent(agent_spec)  # fail early for unknown agents
+    if generator not in generators:
+        raise ValueError("unknown piece generator '%s' (use one of %s)"
+                         % (generator, ", ".join(generators)))
+    if record and (seed < 0 or (games > 0 and seed + games - 1 > max_seed)):
+        raise ValueError("the seeds of the recorded games must be from 0 to 2 ** 64 - 1")
+    tasks = [(agent_spec, seed + i, grid_h, grid_w, max_ticks, generator, record)
+             for i in range(games)]
+    with multiprocessing.Pool(workers) as pool:
+        results = list(pool.imap_unordered(play_game, tasks, chunksize=4))
+    return sorted(results, key=lambda result: result["seed"])
+
+
+# A function that aggregates the statistics of the games
+def summarize(results, elapsed):
+    if not results:
+        return {"games": 0}
+    scores = [result["score"] for result in results]
+    max_tiles = {}
+    for result in results:
+        max_tiles[result["max_tile"]] = max_tiles.get(result["max_tile"], 0) + 1
+    total_ticks = sum(result["ticks"] for result in results)
+    return {
+        "games": len(results),
+        "score_mean": statistics.mean(scores),
+        "score_median": statistics.median(scores),
+        "score_min": min(scores),
+        "score_max": max(scores),
+        "lines_cleared_mean": statistics.mean(r["lines_cleared"] for r in results),
+        "max_tile_counts": dict(sorted(max_tiles.items())),
+        "ticks_mean": total_ticks / len(results),
+        "seconds": elapsed,
+        "games_per_second": len(results) / elapsed,
+        "ticks_per_second": total_ticks / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless Tetris 2048 games of an agent on all cores.")
+    parser.add_argument("--agent", default="random",
+                        help="agent name (%s) or module:function" % ", ".join(agents))
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: number of cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--max-ticks", type=int, default=100000, help="fall ticks after which a game is stopped")
+    parser.add_argument("--grid", type=int, nargs=2, default=(20, 12), metavar=("H", "W"),
+                        help="dimensions of the game grid")
+    parser.add_argument("--generator", default="uniform", choices=sorted(generators),
+                        help="piece generator choosing the types of the tetrominoes")
+    parser.add_argument("--corpus", metavar="PATH",
+                        help="append the replays of the games to this replay corpus (see corpus.py)")
+    parser.add_argument("--json", action="store_true", help="print the summary (and the games) as JSON")
+    args = parser.parse_args()
+    if args.corpus is not None and args.seed < 0:
+        parser.error("--seed must not be negative when the games are recorded with --corpus")
+
+    start_time = time.perf_counter()
+    results = run_tournament(args.agent, args.games, args.workers, args.seed,
+                             args.grid[0], args.grid[1], args.max_ticks, args.generator,
+                             record=args.corpus is not None)
+    summary = summarize(results, time.perf_counter() - start_time)
+    if args.corpus is not None:
+        with ReplayCorpus(args.corpus) as corpus:
+            corpus.extend((result.pop("replay"), result) for result in results)
+    if args.json:
+        print(json.dumps({"summary": summary, "games": results}, indent=2))
+        return
+    for key, value in summary.items():
+        print("%-20s %s" % (key, round(value, 2) if isinstance(value, float) else value))
+
+
+if __name__ == '__main__':
+    main()